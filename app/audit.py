@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
+from .models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Group-commit write-behind buffer for audit events.
+
+    Producers hand over plain row dicts (AuditEvent columns). A background
+    thread writes them with one bulk INSERT per batch, as soon as
+    `batch_size` rows are queued or the oldest queued row is
+    `flush_interval` seconds old.
+
+    - backpressure: when `max_queue` rows are waiting, producers block for
+      up to `submit_timeout` seconds, then write their rows themselves
+    - flush() writes everything queued so far; readers of audit_events call
+      it first so they always see acknowledged events
+    - stop() drains the queue before returning (app shutdown)
+    - while the writer is not running (scripts, or audit_write_behind off)
+      commit_with_events() writes events in the caller's transaction
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        submit_timeout: float,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(self.batch_size, max_queue)
+        self.submit_timeout = submit_timeout
+        self.session_factory = session_factory
+
+        self._queue: deque[dict] = deque()
+        self._cond = threading.Condition()
+        # Held while rows are off the queue but not yet committed
+        self._write_lock = threading.Lock()
+        self._oldest: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked_submits = 0
+        self.overflow_writes = 0
+        self.failed_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ----------------- Producers -----------------
+
+    def commit_with_events(self, db: Session, rows: list[dict]) -> None:
+        """
+        Commit `db` and record its audit events. The events are queued only
+        once the commit succeeded, so they never point at rows that were
+        rolled back.
+        """
+        if not self.running:
+            db.add_all(AuditEvent(**row) for row in rows)
+            db.commit()
+            return
+        db.commit()
+        self.submit(rows)
+
+    def submit(self, rows: Iterable[dict]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        if not self.running:
+            self._write(rows)
+            with self._cond:
+                self.submitted += len(rows)
+            return
+        deadline = time.monotonic() + self.submit_timeout
+        overflow: list[dict] = []
+        with self._cond:
+            blocked = False
+            for i, row in enumerate(rows):
+                while len(self._queue) >= self.max_queue:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.running:
+                        overflow = rows[i:]
+                        break
+                    blocked = True
+                    self._cond.notify_all()
+                    self._cond.wait(remaining)
+                if overflow:
+                    break
+                if not self._queue:
+                    self._oldest = time.monotonic()
+                self._queue.append(row)
+                self.submitted += 1
+            if blocked:
+                self.blocked_submits += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+        if overflow:
+            # Still full after waiting: pay for our own write rather than
+            # dropping audit events
+            self._write(overflow)
+            with self._cond:
+                self.overflow_writes += 1
+                self.submitted += len(overflow)
+
+    # ----------------- Writing -----------------
+
+    def _write(self, rows: list[dict]) -> None:
+        db = self.session_factory()
+        try:
+            try:
+                db.execute(insert(AuditEvent), rows)
+                db.commit()
+                written = len(rows)
+            except Exception:
+                db.rollback()
+                # Isolate the bad row(s) so one conflict cannot sink a batch
+                written = 0
+                for row in rows:
+                    try:
+                        db.execute(insert(AuditEvent), [row])
+                        db.commit()
+                        written += 1
+                    except Exception:
+                        db.rollback()
+                        logger.exception("Dropping audit event %s", row.get("id"))
+        finally:
+            db.close()
+        with self._cond:
+            self.written += written
+            self.failed_rows += len(rows) - written
+            self.batches += 1
+
+    def _take(self, limit: int) -> list[dict]:
+        with self._cond:
+            n = min(limit, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+            self._oldest = time.monotonic() if self._queue else None
+            self._cond.notify_all()
+        return batch
+
+    def flush(self) -> None:
+        """
+        Write every row queued before this call.
+        """
+        with self._write_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _due(self) -> bool:
+        if len(self._queue) >= self.batch_size:
+            return True
+        return bool(self._queue) and time.monotonic() - self._oldest >= self.flush_interval
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping and not self._due():
+                    if self._queue:
+                        self._cond.wait(self._oldest + self.flush_interval - time.monotonic())
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+            with self._write_lock:
+                batch = self._take(self.batch_size)
+                if batch:
+                    self._write(batch)
+
+    # ----------------- Lifecycle -----------------
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the flusher and write whatever is still queued.
+        """
+        if self._thread is not None:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify_all()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self.running,
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                "submitted": self.submitted,
+                "written": self.written,
+                "batches": self.batches,
+                "avg_batch": (self.written / self.batches) if self.batches else 0.0,
+                "blocked_submits": self.blocked_submits,
+                "overflow_writes": self.overflow_writes,
+                "failed_rows": self.failed_rows,
+            }
+
+
+audit_writer = AuditWriter(
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval_ms / 1000.0,
+    max_queue=settings.audit_max_queue,
+    submit_timeout=settings.audit_submit_timeout,
+)
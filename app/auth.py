@@ -1,24 +1,163 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
-from jose import jwt, JWTError
-from passlib.context import CryptContext
-
 from .config import settings
 from .schemas import TokenData
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib and jose are imported on first use, not at module load: they are
+# slow to import and most processes (workers before their first login,
+# scripts, tests) never need them.
+
+
+@functools.lru_cache(maxsize=None)
+def get_pwd_context():
+    """
+    Hashes with a different work factor verify as usual and are flagged for
+    an upgrade (verify_and_update), so changing bcrypt_rounds re-hashes
+    every account on its next login.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 
 def verify_password(plain_password: str, password_hash: str) -> bool:
-    return pwd_context.verify(plain_password, password_hash)
+    return get_pwd_context().verify(plain_password, password_hash)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def _verify_and_update(password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(password, password_hash)
+
+
+# ----------------- Password hashing pool -----------------
+
+
+class HasherBusyError(Exception):
+    """
+    Raised instead of queueing when the password hashing pool already has
+    its maximum of pending jobs. main.py turns it into 503 with Retry-After.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many logins in progress; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own small thread pool, so a burst of logins queues
+    here instead of occupying the threads sync endpoints and the DB pool
+    need. bcrypt releases the GIL, so `workers` threads hash in parallel on
+    as many cores.
+
+    - at most `max_pending` jobs (running + waiting); beyond that callers
+      get HasherBusyError rather than an ever-growing queue
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._service_ewma = 0.25  # seconds per bcrypt call, refined as we go
+
+        self.hashes = 0
+        self.verifies = 0
+        self.rehashes = 0
+        self.rejected = 0
+        self.max_seen_pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._service_ewma = 0.8 * self._service_ewma + 0.2 * elapsed
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                retry_after = max(1, math.ceil(self._service_ewma * self._pending / self.workers))
+                raise HasherBusyError(retry_after)
+            self._pending += 1
+            self.max_seen_pending = max(self.max_seen_pending, self._pending)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._timed, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        result = await self._run(get_password_hash, password)
+        self.hashes += 1
+        return result
+
+    async def verify_and_update(self, password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+        """
+        (matches, replacement hash or None). A replacement is returned when
+        the stored hash uses an outdated scheme or work factor.
+        """
+        ok, new_hash = await self._run(_verify_and_update, password, password_hash)
+        self.verifies += 1
+        if new_hash is not None:
+            self.rehashes += 1
+        return ok, new_hash
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "max_seen_pending": self.max_seen_pending,
+                "bcrypt_rounds": settings.bcrypt_rounds,
+                "avg_seconds": self._service_ewma,
+                "hashes": self.hashes,
+                "verifies": self.verifies,
+                "rehashes": self.rehashes,
+                "rejected": self.rejected,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
+
+# ----------------- Tokens -----------------
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (
         expires_delta
@@ -30,12 +169,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_token(token: str) -> TokenData:
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         username: str = payload.get("sub")
         role: str = payload.get("role")
         if username is None or role is None:
             raise JWTError("Invalid payload")
-        return TokenData(username=username, role=role)
+        return TokenData(username=username, role=role, exp=payload.get("exp"))
     except JWTError as e:
         raise e
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from .config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def _base_url(url: str) -> str:
+    """
+    Accept either a server root (http://host:11434) or a full endpoint URL
+    (http://host:11434/api/generate) and return the server root.
+    """
+    url = url.rstrip("/")
+    for suffix in ("/api/generate", "/api/tags", "/api"):
+        if url.endswith(suffix):
+            return url[: -len(suffix)]
+    return url
+
+
+class Backend:
+    """
+    One Ollama server plus the live numbers used to route to it.
+    """
+
+    def __init__(self, url: str):
+        self.base_url = _base_url(url)
+        self.generate_url = self.base_url + "/api/generate"
+        self.tags_url = self.base_url + "/api/tags"
+
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None  # seconds per generation
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_probe: Optional[float] = None
+
+    def stats(self) -> dict:
+        return {
+            "url": self.base_url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "latency_ewma_seconds": self.latency_ewma,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_probe_age_seconds": (time.monotonic() - self.last_probe) if self.last_probe else None,
+        }
+
+
+class BackendPool:
+    """
+    Routes generations across several Ollama servers.
+
+    - pick() prefers healthy backends and ranks them by expected wait,
+      (in-flight + 1) x recent latency: the least loaded backend wins, and
+      load is weighed against how fast each backend has been lately
+    - a backend leaves rotation after settings.ollama_unhealthy_after
+      consecutive failures and returns once a /api/tags probe succeeds
+    - the background probe loop (start/stop, run from the app lifespan)
+      checks every backend every settings.ollama_health_interval seconds
+    """
+
+    def __init__(self, urls: list[str]):
+        self.backends = [Backend(u) for u in urls]
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def pick(self, exclude: tuple[Backend, ...] = ()) -> Optional[Backend]:
+        candidates = [b for b in self.backends if b not in exclude]
+        if not candidates:
+            return None
+        healthy = [b for b in candidates if b.healthy]
+        # If everything looks down, still try something rather than fail fast
+        pool = healthy or candidates
+
+        known = [b.latency_ewma for b in pool if b.latency_ewma is not None]
+        default_latency = min(known) if known else 1.0
+
+        def score(b: Backend) -> tuple[float, int, int]:
+            latency = b.latency_ewma if b.latency_ewma is not None else default_latency
+            # Ties go to the backend that has served the fewest requests
+            return ((b.in_flight + 1) * latency, b.in_flight, b.requests)
+
+        return min(pool, key=score)
+
+    @contextmanager
+    def track(self, backend: Backend) -> Iterator[None]:
+        """
+        Count a request against the backend; failures are recorded by the
+        caller through mark_failure so it can decide what counts as one.
+        """
+        backend.in_flight += 1
+        backend.requests += 1
+        try:
+            yield
+        finally:
+            backend.in_flight -= 1
+
+    def mark_success(self, backend: Backend, latency: float) -> None:
+        backend.consecutive_failures = 0
+        backend.healthy = True
+        if backend.latency_ewma is None:
+            backend.latency_ewma = latency
+        else:
+            backend.latency_ewma = 0.7 * backend.latency_ewma + 0.3 * latency
+
+    def mark_failure(self, backend: Backend, error: Exception) -> None:
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"
+        if backend.consecutive_failures >= settings.ollama_unhealthy_after:
+            backend.healthy = False
+
+    async def probe(self, client: "httpx.AsyncClient", backend: Backend) -> bool:
+        try:
+            resp = await client.get(backend.tags_url, timeout=settings.ollama_health_timeout)
+            ok = resp.status_code == 200
+        except Exception as e:
+            backend.last_error = f"probe: {type(e).__name__}: {e}"
+            ok = False
+        backend.last_probe = time.monotonic()
+        backend.healthy = ok
+        if ok:
+            backend.consecutive_failures = 0
+        return ok
+
+    async def probe_all(self, client: "httpx.AsyncClient") -> None:
+        await asyncio.gather(*(self.probe(client, b) for b in self.backends))
+
+    async def _probe_loop(self, client: "httpx.AsyncClient") -> None:
+        while True:
+            await self.probe_all(client)
+            await asyncio.sleep(settings.ollama_health_interval)
+
+    def start(self, client: "httpx.AsyncClient") -> None:
+        if self._probe_task is None and settings.ollama_health_interval > 0:
+            self._probe_task = asyncio.create_task(self._probe_loop(client))
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    def stats(self) -> list[dict]:
+        return [b.stats() for b in self.backends]
+
+
+_pool: Optional[BackendPool] = None
+
+
+def configured_backend_urls() -> list[str]:
+    return list(settings.ollama_backends) or [settings.ollama_url]
+
+
+def get_backend_pool() -> BackendPool:
+    """
+    The process-wide pool, built from Settings on first use.
+    """
+    global _pool
+    if _pool is None:
+        _pool = BackendPool(configured_backend_urls())
+    return _pool
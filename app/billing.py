@@ -0,0 +1,256 @@
+import argparse
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .llm import FALLBACK_NOTE, TIER_FALLBACK, TIER_LLM, TIER_RULES
+from .models import BillingDaily, BillingWeekly, Client, RewriteRecord, TimeEntry
+from .schemas import BillingReport, BillingRow, RewriteResponse
+
+_SUMS = ("entries", "hours", "fallbacks", "rules_entries", "llm_entries")
+
+
+def week_start(day: date) -> date:
+    """
+    The Monday of `day`'s ISO week.
+    """
+    return day - timedelta(days=day.weekday())
+
+
+# ----------------- Summary maintenance -----------------
+
+# Every save path adds its entries with record_billing() in the transaction
+# that inserts them, so the summaries never disagree with time_entries and
+# GET /admin/stats/... reads a handful of rows however long the history is.
+
+
+class BillingAccumulator:
+    """
+    Sums entries per (day, client) and (week, client) so any number of them
+    becomes one upsert per summary row.
+    """
+
+    def __init__(self):
+        self.daily: dict[tuple, list] = defaultdict(lambda: [0] * len(_SUMS))
+        self.weekly: dict[tuple, list] = defaultdict(lambda: [0] * len(_SUMS))
+
+    def add_sums(self, day: date, client_id: str, sums: Iterable) -> None:
+        """
+        `sums` are the _SUMS columns: entries, hours, fallbacks,
+        rules_entries, llm_entries.
+        """
+        sums = tuple(sums)
+        for target, key in (
+            (self.daily, (day.isoformat(), client_id)),
+            (self.weekly, (week_start(day).isoformat(), client_id)),
+        ):
+            row = target[key]
+            for i, value in enumerate(sums):
+                row[i] += value
+
+    def add_entry(self, created_at: datetime, client_id: str, hours: float, rewrite: RewriteResponse) -> None:
+        tier = rewrite.tier
+        self.add_sums(
+            created_at.date(),
+            client_id,
+            (1, hours, int(tier == TIER_FALLBACK), int(tier == TIER_RULES), int(tier == TIER_LLM)),
+        )
+
+    def flush(self, db: Session) -> None:
+        """
+        Upsert the sums into both summary tables inside `db`'s transaction.
+        """
+        for model, key_col, totals in ((BillingDaily, "day", self.daily), (BillingWeekly, "week", self.weekly)):
+            if not totals:
+                continue
+            stmt = insert(model).values(
+                [dict(zip((key_col, "client_id") + _SUMS, key + tuple(sums))) for key, sums in totals.items()]
+            )
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[key_col, "client_id"],
+                    set_={c: getattr(model, c) + stmt.excluded[c] for c in _SUMS},
+                )
+            )
+            totals.clear()
+
+
+def record_billing(db: Session, saved: Iterable[tuple[datetime, str, float, RewriteResponse]]) -> None:
+    """
+    Add saved entries, as (created_at, client_id, hours, rewrite), to the
+    billing summaries. Call before committing the entries themselves so
+    both land in the same transaction.
+    """
+    acc = BillingAccumulator()
+    for created_at, client_id, hours, rewrite in saved:
+        acc.add_entry(created_at, client_id, hours, rewrite)
+    acc.flush(db)
+
+
+def _aggregate_entries(start: date, end: date):
+    """
+    Summary sums per (day, client) for entries created in [start, end),
+    straight from time_entries, each joined to its latest rewrite only so
+    an entry with several rewrites is still counted and billed once.
+    Rewrites saved before the tier / is_fallback columns existed are
+    recognised by their note.
+    """
+    day = func.date(TimeEntry.created_at)
+    latest_rewrite_id = (
+        select(RewriteRecord.id)
+        .where(RewriteRecord.time_entry_id == TimeEntry.id)
+        .order_by(RewriteRecord.created_at.desc(), RewriteRecord.id.desc())
+        .limit(1)
+        .correlate(TimeEntry)
+        .scalar_subquery()
+    )
+    fallback = or_(
+        RewriteRecord.is_fallback.is_(True),
+        and_(
+            RewriteRecord.is_fallback.is_(None),
+            or_(RewriteRecord.tier == TIER_FALLBACK, RewriteRecord.notes == FALLBACK_NOTE),
+        ),
+    )
+    return (
+        select(
+            day,
+            TimeEntry.client_id,
+            func.count(TimeEntry.id),
+            func.coalesce(func.sum(TimeEntry.hours), 0.0),
+            func.sum(case((fallback, 1), else_=0)),
+            func.sum(case((RewriteRecord.tier == TIER_RULES, 1), else_=0)),
+            func.sum(case((RewriteRecord.tier == TIER_LLM, 1), else_=0)),
+        )
+        .outerjoin(RewriteRecord, RewriteRecord.id == latest_rewrite_id)
+        .where(
+            TimeEntry.created_at >= datetime.combine(start, datetime.min.time()),
+            TimeEntry.created_at < datetime.combine(end, datetime.min.time()),
+        )
+        .group_by(day, TimeEntry.client_id)
+    )
+
+
+def rebuild_billing_summaries(bind, since: Optional[date] = None, weeks_per_chunk: int = 1) -> int:
+    """
+    Recompute the summaries from time_entries, `weeks_per_chunk` weeks per
+    transaction (from the week containing `since`, or all history). Each
+    transaction deletes its weeks' rows and re-inserts them from the
+    entries, so saves running alongside are neither lost nor counted
+    twice and the write lock is only held one chunk at a time. Returns the
+    number of entries read.
+    """
+    db = Session(bind=bind)
+    try:
+        first, last = db.execute(select(func.min(TimeEntry.created_at), func.max(TimeEntry.created_at))).one()
+        today = datetime.utcnow().date()
+        start = week_start(since or (first.date() if first else today))
+        stop = week_start(max(last.date() if last else today, today)) + timedelta(weeks=1)
+
+        if since is None:
+            # Nothing is saved before the first entry; drop any stale rows
+            db.execute(delete(BillingDaily).where(BillingDaily.day < start.isoformat()))
+            db.execute(delete(BillingWeekly).where(BillingWeekly.week < start.isoformat()))
+            db.commit()
+
+        count = 0
+        chunk = timedelta(weeks=max(1, weeks_per_chunk))
+        while start < stop:
+            end = start + chunk
+            db.execute(
+                delete(BillingDaily).where(BillingDaily.day >= start.isoformat(), BillingDaily.day < end.isoformat())
+            )
+            db.execute(
+                delete(BillingWeekly).where(BillingWeekly.week >= start.isoformat(), BillingWeekly.week < end.isoformat())
+            )
+            acc = BillingAccumulator()
+            for day, client_id, entries, hours, fallbacks, rules, llm in db.execute(_aggregate_entries(start, end)):
+                acc.add_sums(date.fromisoformat(day), client_id, (entries, hours, fallbacks, rules, llm))
+                count += entries
+            acc.flush(db)
+            db.commit()
+            start = end
+        return count
+    finally:
+        db.close()
+
+
+# ----------------- Reporting -----------------
+
+
+def billing_report(
+    db: Session,
+    since: date,
+    until: date,
+    period: str = "day",
+    client_id: Optional[str] = None,
+) -> BillingReport:
+    """
+    Entries, hours and fallback rate per client between `since` and
+    `until` (inclusive days): one row per day, per week (weeks whose Monday
+    falls in the range after rounding both ends down to a Monday), or one
+    total per client. Reads only the summary tables.
+    """
+    if period == "week":
+        model, key = BillingWeekly, BillingWeekly.week
+        since, until = week_start(since), week_start(until)
+    else:
+        model, key = BillingDaily, BillingDaily.day
+
+    if period == "total":
+        columns = [func.sum(getattr(model, c)) for c in _SUMS]
+        q = select(model.client_id, Client.name, *columns).group_by(model.client_id).order_by(model.client_id)
+    else:
+        columns = [getattr(model, c) for c in _SUMS]
+        q = select(model.client_id, Client.name, *columns, key).order_by(key, model.client_id)
+    q = q.outerjoin(Client, Client.id == model.client_id).where(key >= since.isoformat(), key <= until.isoformat())
+    if client_id:
+        q = q.where(model.client_id == client_id)
+
+    rows = []
+    for row in db.execute(q):
+        row_client_id, name, entries, hours, fallbacks, rules, llm = row[:7]
+        rows.append(
+            BillingRow(
+                period_start=row[7] if period != "total" else None,
+                client_id=row_client_id,
+                client_name=name,
+                entries=entries,
+                hours=round(hours, 2),
+                fallbacks=fallbacks,
+                fallback_rate=fallbacks / entries if entries else 0.0,
+                rules_entries=rules,
+                llm_entries=llm,
+            )
+        )
+    return BillingReport(period=period, since=since.isoformat(), until=until.isoformat(), rows=rows)
+
+
+def main() -> None:
+    """
+    Rebuild the summaries of an existing database (the first start after
+    the upgrade does this on its own):
+
+        python -m app.billing                      # all history
+        python -m app.billing --since 2025-01-01   # weeks from that day on
+    """
+    parser = argparse.ArgumentParser(description="Rebuild the billing summary tables from saved time entries")
+    parser.add_argument("--since", type=date.fromisoformat, help="only rebuild weeks from this day on (YYYY-MM-DD)")
+    parser.add_argument("--weeks-per-chunk", type=int, default=1, help="weeks rebuilt per transaction")
+    args = parser.parse_args()
+
+    from .db import Base, add_missing_indexes, engine
+
+    Base.metadata.create_all(bind=engine, tables=[BillingDaily.__table__, BillingWeekly.__table__])
+    add_missing_indexes(engine)
+    start = time.perf_counter()
+    count = rebuild_billing_summaries(engine, since=args.since, weeks_per_chunk=args.weeks_per_chunk)
+    print(f"rebuilt billing summaries from {count} entries in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from .billing import rebuild_billing_summaries
+from .db import Base, add_missing_columns, add_missing_indexes, engine
+from .models import backfill_time_entry_usernames, seed_demo_clients_and_admin
+from .usage import rebuild_usage_rollups
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the steps stay idempotent
+    fcntl = None
+
+_initialized = False
+
+
+def _lock_path(bind: Engine) -> str:
+    database = bind.url.database
+    if bind.url.get_backend_name() == "sqlite" and database and database != ":memory:":
+        return os.path.abspath(database) + ".init.lock"
+    return os.path.join(tempfile.gettempdir(), "time_rewrite.init.lock")
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """
+    Exclusive lock shared by every process on this host.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def init_database(bind: Engine = engine) -> None:
+    """
+    Create missing tables, columns and indexes and seed the demo data.
+
+    Called from the app lifespan rather than at import. Runs once per
+    process; workers starting together take turns on a lock file next to
+    the database, so only the first does real work and the rest find
+    everything in place (every step is a no-op on an initialised database,
+    and seeding only hashes passwords for an empty users table).
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _file_lock(_lock_path(bind)):
+        had_usage = inspect(bind).has_table("usage_daily")
+        had_billing = inspect(bind).has_table("billing_daily")
+        Base.metadata.create_all(bind=bind)
+        if "time_entries.username" in add_missing_columns(bind):
+            backfill_time_entry_usernames(bind)
+        add_missing_indexes(bind)
+        if not had_usage:
+            # Upgrade: roll up the rewrites saved before the tables existed
+            rebuild_usage_rollups(bind)
+        if not had_billing:
+            rebuild_billing_summaries(bind)
+        seed_demo_clients_and_admin()
+    _initialized = True
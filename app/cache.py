@@ -0,0 +1,381 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from .config import settings
+from .db import SessionLocal, run_in_db
+from .llm import PROMPT_VERSION, STREAM_FIELDS, call_ollama, call_ollama_stream, is_fallback
+from .models import RewriteCacheEntry
+from .examples import ExampleSelection
+from .fastpath import try_fast_path
+from .profiles import ClientProfile, compile_terms, rules_hash, term_substitutions
+from .scheduler import PRIORITY_INTERACTIVE
+from .singleflight import SingleFlight
+from .schemas import RewriteResponse
+
+
+# ----------------- Keys -----------------
+
+
+def normalize_original(original: str) -> str:
+    """
+    Collapse whitespace so trivially different resubmissions share a key.
+    """
+    return " ".join(original.split())
+
+
+def rewrite_cache_key(
+    original: str,
+    hours: float,
+    rules: Optional[dict],
+    digest: Optional[str] = None,
+) -> str:
+    """
+    `digest` is a precomputed rules_hash(rules), e.g. ClientProfile.rules_hash.
+    """
+    parts = [
+        normalize_original(original),
+        repr(float(hours)),
+        digest or rules_hash(rules),
+        settings.model_name,
+        PROMPT_VERSION,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# ----------------- Cache -----------------
+
+
+class RewriteCache:
+    """
+    Two-level rewrite cache:
+
+    - an in-memory LRU with TTL (per process)
+    - the rewrite_cache table, so entries survive restarts and are shared
+      between workers
+
+    Fallback rewrites are never stored: they usually mean Ollama was down or
+    produced garbage, and a retry may well succeed.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        # key -> (created_at, client_id, rewrite)
+        self._entries: "OrderedDict[str, tuple[datetime, Optional[str], RewriteResponse]]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def _expired(self, created_at: datetime) -> bool:
+        return created_at + self.ttl < datetime.utcnow()
+
+    def _remember(self, key: str, created_at: datetime, client_id: Optional[str], rewrite: RewriteResponse) -> None:
+        self._entries[key] = (created_at, client_id, rewrite)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_memory(self, key: str) -> Optional[RewriteResponse]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            created_at, _, rewrite = item
+            if self._expired(created_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return rewrite.model_copy()
+
+    def _get_persistent(self, key: str) -> Optional[RewriteResponse]:
+        db = SessionLocal()
+        try:
+            row = db.query(RewriteCacheEntry).filter(RewriteCacheEntry.key == key).first()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            if self._expired(row.created_at):
+                db.delete(row)
+                db.commit()
+                with self._lock:
+                    self.misses += 1
+                return None
+            rewrite = RewriteResponse.model_validate_json(row.payload)
+            created_at, client_id = row.created_at, row.client_id
+        finally:
+            db.close()
+
+        with self._lock:
+            self._remember(key, created_at, client_id, rewrite)
+            self.persistent_hits += 1
+        return rewrite.model_copy()
+
+    def get(self, key: str) -> Optional[RewriteResponse]:
+        hit = self._get_memory(key)
+        if hit is not None:
+            return hit
+        return self._get_persistent(key)
+
+    async def aget(self, key: str) -> Optional[RewriteResponse]:
+        """
+        get() for async callers: memory hits stay on the event loop, the
+        table lookup runs on the DB thread pool.
+        """
+        hit = self._get_memory(key)
+        if hit is not None:
+            return hit
+        return await run_in_db(self._get_persistent, key)
+
+    def put(self, key: str, rewrite: RewriteResponse, client_id: Optional[str] = None) -> None:
+        if is_fallback(rewrite):
+            return
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.merge(
+                RewriteCacheEntry(
+                    key=key,
+                    client_id=client_id,
+                    payload=rewrite.model_dump_json(),
+                    created_at=now,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        with self._lock:
+            # A hit costs no model call, so it must not carry this one's telemetry
+            self._remember(key, now, client_id, rewrite.model_copy(update={"telemetry": None}))
+            self.stores += 1
+
+    async def aput(self, key: str, rewrite: RewriteResponse, client_id: Optional[str] = None) -> None:
+        if not is_fallback(rewrite):
+            await run_in_db(self.put, key, rewrite, client_id)
+
+    def invalidate_client(self, client_id: str) -> int:
+        """
+        Drop every cached rewrite produced for this client. Returns the number
+        of persistent entries removed.
+        """
+        with self._lock:
+            stale = [k for k, (_, cid, _) in self._entries.items() if cid == client_id]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += 1
+
+        db = SessionLocal()
+        try:
+            removed = (
+                db.query(RewriteCacheEntry)
+                .filter(RewriteCacheEntry.client_id == client_id)
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        db = SessionLocal()
+        try:
+            db.query(RewriteCacheEntry).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": settings.rewrite_cache_enabled,
+                "entries_in_memory": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": int(self.ttl.total_seconds()),
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+            }
+
+
+rewrite_cache = RewriteCache(
+    max_entries=settings.rewrite_cache_max_entries,
+    ttl_seconds=settings.rewrite_cache_ttl_seconds,
+)
+
+
+def _profile_prompt(
+    profile: Optional[ClientProfile],
+    original: str,
+    examples: Optional[ExampleSelection],
+) -> tuple[Optional[str], Optional[str]]:
+    """
+    (prompt prefix, rules digest) for a profile-backed rewrite: the client's
+    stable prefix followed by the examples selected for this narrative.
+    """
+    if profile is None:
+        return None, None
+    if examples is None:
+        examples = profile.select_examples(original)
+    return profile.prompt_prefix + examples.prompt_block(), profile.rules_hash
+
+
+def _fast_path(
+    profile: Optional[ClientProfile],
+    rules: Optional[dict],
+    original: str,
+    hours: float,
+) -> Optional[RewriteResponse]:
+    if profile is not None:
+        return try_fast_path(original, hours, profile.forbidden, profile.substitutions)
+    forbidden = compile_terms((rules or {}).get("forbidden_terms") or [])
+    return try_fast_path(original, hours, forbidden, term_substitutions(rules))
+
+
+class _Generation:
+    """
+    What one single-flight generation hands every caller waiting on it.
+    The model call's telemetry belongs to the generation, not to whichever
+    caller started it: the first caller to take the result gets it, so a
+    leader that disconnects does not take the usage record with it.
+    """
+
+    __slots__ = ("rewrite", "_telemetry")
+
+    def __init__(self, rewrite: RewriteResponse):
+        self.rewrite = rewrite.model_copy(update={"telemetry": None})
+        self._telemetry = rewrite.telemetry
+
+    def take(self) -> RewriteResponse:
+        telemetry, self._telemetry = self._telemetry, None
+        return self.rewrite.model_copy(update={"telemetry": telemetry})
+
+
+# Identical rewrites already running are awaited, not regenerated
+rewrite_flights = SingleFlight()
+
+
+async def cached_rewrite(
+    original: str,
+    hours: float,
+    rules: Optional[dict] = None,
+    client_id: Optional[str] = None,
+    user: str = "anonymous",
+    priority: int = PRIORITY_INTERACTIVE,
+    profile: Optional[ClientProfile] = None,
+    examples: Optional[ExampleSelection] = None,
+) -> RewriteResponse:
+    """
+    call_ollama behind the rewrite cache and single-flight coalescing. Used
+    by every rewrite endpoint. Hits never touch the LLM scheduler; the
+    leader of a miss queues as `user` at `priority` and its followers share
+    its result (or its error).
+
+    Pass either explicit `rules` or a compiled client `profile`, which also
+    supplies the client id, rules hash and prompt prefix. With a profile,
+    only the examples most relevant to `original` go into the prompt;
+    callers that want to report the savings pass their own `examples`.
+
+    Short, formulaic entries are answered by the rules tier
+    (app/fastpath.py) before any of that; check RewriteResponse.tier.
+    """
+    fast = _fast_path(profile, rules, original, hours)
+    if fast is not None:
+        return fast
+
+    prefix, digest = _profile_prompt(profile, original, examples)
+    forbidden = None
+    if profile is not None:
+        rules, client_id = profile.rules, profile.client_id
+        forbidden = profile.forbidden
+
+    key = rewrite_cache_key(original, hours, rules, digest)
+    if settings.rewrite_cache_enabled:
+        hit = await rewrite_cache.aget(key)
+        if hit is not None:
+            return hit
+
+    async def generate() -> _Generation:
+        rewrite = await call_ollama(
+            original=original,
+            hours=hours,
+            rules=rules,
+            user=user,
+            priority=priority,
+            prompt_prefix=prefix,
+            forbidden=forbidden,
+        )
+        if settings.rewrite_cache_enabled:
+            await rewrite_cache.aput(key, rewrite, client_id=client_id)
+        return _Generation(rewrite)
+
+    # Each caller gets its own copy; exactly one of them carries telemetry
+    return (await rewrite_flights.do(key, generate)).take()
+
+
+async def cached_rewrite_stream(
+    original: str,
+    hours: float,
+    rules: Optional[dict] = None,
+    client_id: Optional[str] = None,
+    user: str = "anonymous",
+    priority: int = PRIORITY_INTERACTIVE,
+    profile: Optional[ClientProfile] = None,
+    examples: Optional[ExampleSelection] = None,
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    call_ollama_stream behind the rewrite cache. A hit replays the cached
+    fields immediately, followed by the result event, and so does a
+    rules-tier answer.
+    """
+    fast = _fast_path(profile, rules, original, hours)
+    if fast is not None:
+        for name in STREAM_FIELDS:
+            yield "field", (name, getattr(fast, name))
+        yield "result", fast
+        return
+
+    prefix, digest = _profile_prompt(profile, original, examples)
+    forbidden = None
+    if profile is not None:
+        rules, client_id = profile.rules, profile.client_id
+        forbidden = profile.forbidden
+
+    key = rewrite_cache_key(original, hours, rules, digest)
+    if settings.rewrite_cache_enabled:
+        hit = await rewrite_cache.aget(key)
+        if hit is not None:
+            for name in STREAM_FIELDS:
+                yield "field", (name, getattr(hit, name))
+            yield "result", hit
+            return
+
+    async for kind, value in call_ollama_stream(
+        original=original,
+        hours=hours,
+        rules=rules,
+        user=user,
+        priority=priority,
+        prompt_prefix=prefix,
+        forbidden=forbidden,
+    ):
+        if kind == "result" and settings.rewrite_cache_enabled:
+            await rewrite_cache.aput(key, value, client_id=client_id)
+        yield kind, value
@@ -1,10 +1,94 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 class Settings(BaseModel):
     ollama_url: str = "http://localhost:11434/api/generate"
+    # Several Ollama servers (root or /api/generate URLs); empty = just ollama_url
+    ollama_backends: List[str] = []
     model_name: str = "qwen2.5:7b"
     secret_key: str = "change-me-super-secret"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60
 
+    # Verified token -> principal cache in get_current_user (app/principals.py);
+    # the TTL bounds how long another worker process may honour a deactivated user
+    auth_cache_ttl_seconds: float = 60.0  # 0 disables
+    auth_cache_max_entries: int = 4096
+
+    # Password hashing (app/auth.py) runs on its own pool, apart from the
+    # threads sync endpoints and DB calls use
+    bcrypt_rounds: int = 12  # hashes with other rounds are re-hashed on login
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64  # logins beyond this get 503
+
+    # Shared Ollama HTTP client (one pool for the whole process)
+    ollama_timeout: float = 90.0
+    ollama_connect_timeout: float = 5.0
+    ollama_max_connections: int = 20
+    ollama_max_keepalive_connections: int = 10
+    ollama_keepalive_expiry: float = 60.0
+
+    # Backend pool routing / health (app/backends.py)
+    ollama_max_attempts: int = 2  # backends tried per generation before falling back
+    ollama_unhealthy_after: int = 3  # consecutive failures that take a backend out
+    ollama_health_interval: float = 15.0  # seconds between /api/tags probes; 0 disables
+    ollama_health_timeout: float = 2.0
+
+    # Rewrite cache (in-memory LRU in front of the rewrite_cache table)
+    rewrite_cache_enabled: bool = True
+    rewrite_cache_max_entries: int = 2048
+    rewrite_cache_ttl_seconds: int = 7 * 24 * 3600
+
+    # /rewrites/batch
+    batch_max_items: int = 1000
+    batch_concurrency: int = 4
+    batch_flush_size: int = 50  # rows per bulk insert
+    batch_flush_interval: float = 1.0  # seconds a finished item may wait for its flush
+
+    # Background import jobs (app/jobs.py)
+    job_workers: int = 2
+    job_max_upload_bytes: int = 100 * 1024 * 1024  # larger imports get 413
+    job_insert_chunk: int = 500  # parsed rows per insert while enqueueing
+    job_poll_interval: float = 5.0  # idle workers re-check the queue this often
+    job_error_backoff: float = 1.0  # seconds a worker waits after an unexpected DB error
+
+    # Threads that run blocking SQLAlchemy calls for async code (app/db.py)
+    db_executor_workers: int = 4
+
+    # SQLite pragmas applied to every new connection (app/db.py); None skips one
+    sqlite_journal_mode: Optional[str] = "wal"
+    sqlite_synchronous: Optional[str] = "normal"  # safe with WAL; "full" for fsync per commit
+    sqlite_busy_timeout_ms: Optional[int] = 5000
+    sqlite_cache_size_kib: Optional[int] = 20000
+
+    # Group-commit audit writer (app/audit.py)
+    audit_write_behind: bool = True
+    audit_batch_size: int = 200  # flush when this many events are queued...
+    audit_flush_interval_ms: int = 50  # ...or the oldest has waited this long
+    audit_max_queue: int = 10000  # producers block beyond this (backpressure)
+    audit_submit_timeout: float = 2.0  # then write their own events
+
+    # Prometheus text metrics at GET /metrics (app/metrics.py)
+    metrics_enabled: bool = True
+
+    # LLM admission control (app/scheduler.py)
+    llm_max_concurrency: int = 4
+    llm_max_queue_depth: int = 32  # interactive callers beyond this get 429
+
+    # Compiled client profiles (app/profiles.py); bounds staleness across workers
+    client_profile_ttl_seconds: float = 300.0
+
+    # Few-shot example selection (app/examples.py)
+    examples_top_k: int = 3  # per kind (accepted / denied)
+    examples_token_budget: int = 400
+
+    # Rules-only tier for short, formulaic entries (app/fastpath.py)
+    fastpath_enabled: bool = True
+    fastpath_max_words: int = 12
+    fastpath_max_chars: int = 120
+    # Share of meaningful words that must be routine billing vocabulary
+    fastpath_min_known_ratio: float = 1.0
+    fastpath_extra_vocabulary: List[str] = []
+
 settings = Settings()
@@ -1,11 +1,141 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from .config import settings
+from .metrics import instrument_engine
+
+T = TypeVar("T")
+
 SQLALCHEMY_DATABASE_URL = "sqlite:///./time_rewrite.db"
 
+
+def sqlite_pragmas() -> dict:
+    """
+    Pragmas from Settings, in the order they are applied.
+    """
+    pragmas = {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -settings.sqlite_cache_size_kib if settings.sqlite_cache_size_kib else None,
+    }
+    return {k: v for k, v in pragmas.items() if v is not None}
+
+
+def configure_sqlite(bind, pragmas: Optional[dict] = None) -> None:
+    """
+    Apply pragmas (default: sqlite_pragmas()) on every new connection.
+    """
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(bind, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+configure_sqlite(engine)
+if settings.metrics_enabled:
+    instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+
+# ----------------- DB thread pool -----------------
+
+# Async code never runs SQLAlchemy calls on the event loop; it hands them to
+# this pool with run_in_db. Kept apart from the default executor so DB work
+# cannot be starved by (or starve) other to_thread users.
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.db_executor_workers),
+            thread_name_prefix="db",
+        )
+    return _db_executor
+
+
+def shutdown_db_executor() -> None:
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
+
+
+async def run_in_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking DB function on the DB thread pool and await its result.
+    Context variables are carried over. A Session may be passed along as
+    long as the caller does not use it concurrently.
+
+    With settings.db_executor_workers = 0 the call runs inline on the event
+    loop (only useful as a baseline for benchmarks).
+    """
+    if settings.db_executor_workers <= 0:
+        return fn(*args, **kwargs)
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_db_executor(), call)
+
+
+def add_missing_columns(bind=engine) -> list[str]:
+    """
+    create_all() never alters existing tables, and there is no migration
+    tool here. Add any model column the database does not have yet (nullable
+    columns only; SQLite cannot add constraints later). Returns what was
+    added as "table.column".
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in have:
+                    continue
+                ddl_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl_type}'))
+                if column.index:
+                    conn.execute(
+                        text(f'CREATE INDEX IF NOT EXISTS "ix_{table.name}_{column.name}" ON "{table.name}" ("{column.name}")')
+                    )
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def add_missing_indexes(bind=engine) -> None:
+    """
+    Same problem as add_missing_columns for indexes declared on tables that
+    already exist.
+    """
+    from sqlalchemy import inspect
+
+    existing_tables = set(inspect(bind).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name in existing_tables:
+            for index in table.indexes:
+                index.create(bind, checkfirst=True)
@@ -1,13 +1,21 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 
 from .db import SessionLocal
 from .auth import decode_token
 from .models import User
+from .principals import Principal, principal_cache
 from .schemas import TokenData
 
 
 def get_db():
+    """
+    The one session dependency. FastAPI caches it per request, so an
+    endpoint and get_current_user share a single session and connection.
+    """
     db = SessionLocal()
     try:
         yield db
@@ -15,12 +23,20 @@ def get_db():
         db.close()
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> Principal:
+    """
+    Resolves the bearer token to a Principal. Repeat requests with the same
+    token are served from principal_cache without decoding or a users query.
+    """
     auth = request.headers.get("Authorization")
     if not auth or not auth.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid token")
 
     token = auth.split()[1]
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     try:
         token_data: TokenData = decode_token(token)
     except Exception:
@@ -30,10 +46,28 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
 
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, token_data.exp)
+    return principal
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return current_user
+
+
+# Default window of the date-range reports (GET /admin/usage, /admin/stats/...)
+REPORT_DEFAULT_DAYS = 30
+
+
+def report_range(since: Optional[date] = None, until: Optional[date] = None) -> tuple[date, date]:
+    """
+    The `since` / `until` query parameters of a report as inclusive UTC
+    days, defaulting to the last REPORT_DEFAULT_DAYS days up to today.
+    """
+    until = until or datetime.utcnow().date()
+    since = since or until - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    if since > until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since is after until")
+    return since, until
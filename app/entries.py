@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from .config import settings
+from .ids import new_id
+from .models import RewriteRecord, TimeEntry
+from .profiles import ClientProfile
+from .schemas import RewriteResponse
+from .usage import telemetry_columns
+
+
+def build_saved_rows(
+    profile: ClientProfile,
+    original: str,
+    hours: float,
+    rewrite: RewriteResponse,
+    username: str,
+    role: str,
+    now: datetime,
+) -> tuple[list, dict, tuple[str, str]]:
+    """
+    The rows every save path writes for one rewritten entry:
+    ([TimeEntry, RewriteRecord], audit event dict, (time_entry_id,
+    rewrite_id)). The event is a plain AuditEvent column dict so callers
+    can hand it to the audit writer or build the row themselves.
+    """
+    time_entry_id, rewrite_id = new_id("TE"), new_id("RW")
+    telemetry = telemetry_columns(rewrite)
+    rows = [
+        TimeEntry(
+            id=time_entry_id,
+            client_id=profile.client_id,
+            original=original,
+            hours=hours,
+            username=username,
+            created_at=now,
+        ),
+        RewriteRecord(
+            id=rewrite_id,
+            time_entry_id=time_entry_id,
+            standard=rewrite.standard,
+            client_compliant=rewrite.client_compliant,
+            audit_safe=rewrite.audit_safe,
+            notes=rewrite.notes,
+            tier=rewrite.tier,
+            created_at=now,
+            **telemetry,
+        ),
+    ]
+    event = {
+        "id": new_id("AE"),
+        "timestamp": now,
+        "username": username,
+        "role": role,
+        "client_id": profile.client_id,
+        "time_entry_id": time_entry_id,
+        "rewrite_id": rewrite_id,
+        "model_name": settings.model_name,
+        "rules_snapshot": profile.rules_json,
+        **telemetry,
+    }
+    return rows, event, (time_entry_id, rewrite_id)
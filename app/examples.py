@@ -0,0 +1,146 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .validation import STOPWORDS
+
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_WORD = re.compile(r"\b\w+\b")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap prompt-token estimate (~4 characters per token for English). Good
+    enough for budgeting; we never need the model's exact count here.
+    """
+    return (len(text) + 3) // 4
+
+
+def split_examples(blob: Optional[str]) -> list[str]:
+    """
+    Admins paste examples as free text. Paragraphs separated by blank lines
+    are one example each; without blank lines every non-empty line is one.
+    Leading bullets / numbering are stripped.
+    """
+    if not blob or not blob.strip():
+        return []
+    text = blob.replace("\r\n", "\n").strip()
+    if re.search(r"\n\s*\n", text):
+        parts = re.split(r"\n\s*\n", text)
+    else:
+        parts = text.split("\n")
+    items = []
+    for part in parts:
+        part = _BULLET.sub("", part.strip()).strip()
+        if part:
+            items.append(part)
+    return items
+
+
+def _terms(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+class ExampleIndex:
+    """
+    Okapi BM25 over one client's examples. Built once per client profile.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, examples: list[str]):
+        self.examples = examples
+        self.tokens = [estimate_tokens(e) for e in examples]
+        self._tf = [Counter(_terms(e)) for e in examples]
+        self._len = [sum(tf.values()) for tf in self._tf]
+        self._avg_len = (sum(self._len) / len(self._len)) if self._len else 0.0
+
+        df: Counter = Counter()
+        for tf in self._tf:
+            df.update(tf.keys())
+        n = len(examples)
+        self._idf = {t: math.log(1 + (n - c + 0.5) / (c + 0.5)) for t, c in df.items()}
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens)
+
+    def rank(self, query: str) -> list[tuple[float, int]]:
+        """
+        (score, example index) for every example sharing a term with the
+        query, best first.
+        """
+        q_terms = set(_terms(query)) & self._idf.keys()
+        if not q_terms:
+            return []
+        scored = []
+        for i, tf in enumerate(self._tf):
+            norm = self.k1 * (1 - self.b + self.b * self._len[i] / (self._avg_len or 1.0))
+            score = 0.0
+            for t in q_terms:
+                f = tf.get(t)
+                if f:
+                    score += self._idf[t] * f * (self.k1 + 1) / (f + norm)
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return scored
+
+
+@dataclass
+class ExampleSelection:
+    accepted: list[str] = field(default_factory=list)
+    denied: list[str] = field(default_factory=list)
+    tokens_used: int = 0
+    tokens_available: int = 0  # what pasting every example would have cost
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_available - self.tokens_used)
+
+    def prompt_block(self) -> str:
+        """
+        Goes between the client's stable prompt prefix and the entry itself.
+        """
+        parts = []
+        if self.accepted:
+            parts.append(
+                "Relevant accepted examples (follow this style):\n"
+                + "\n".join(f"- {e}" for e in self.accepted)
+            )
+        if self.denied:
+            parts.append(
+                "Relevant denied examples (avoid these patterns):\n"
+                + "\n".join(f"- {e}" for e in self.denied)
+            )
+        return ("\n\n".join(parts) + "\n\n") if parts else ""
+
+
+def select_examples(
+    query: str,
+    accepted: ExampleIndex,
+    denied: ExampleIndex,
+    top_k: int,
+    token_budget: int,
+) -> ExampleSelection:
+    """
+    Take the top_k most similar accepted and denied examples, interleaved
+    by score, until token_budget is spent. Examples with no term overlap
+    with the query are never included.
+    """
+    selection = ExampleSelection(tokens_available=accepted.total_tokens + denied.total_tokens)
+    candidates = [(s, i, "accepted") for s, i in accepted.rank(query)[:top_k]]
+    candidates += [(s, i, "denied") for s, i in denied.rank(query)[:top_k]]
+    candidates.sort(key=lambda c: -c[0])
+
+    for _, i, kind in candidates:
+        index = accepted if kind == "accepted" else denied
+        cost = index.tokens[i]
+        if selection.tokens_used + cost > token_budget:
+            continue
+        getattr(selection, kind).append(index.examples[i])
+        selection.tokens_used += cost
+    return selection
@@ -0,0 +1,185 @@
+import re
+from typing import Optional
+
+from .config import settings
+from .llm import TIER_RULES, _simple_fallback_rewrite
+from .schemas import RewriteResponse
+from .validation import STOPWORDS, ValidationContext, default_validator
+
+FAST_PATH_NOTE = "Formulaic entry: cleaned up with rules only, no model call."
+
+# Words that make up routine billing narratives. An entry whose meaningful
+# words are (almost) all in here only needs cleanup; anything else goes to
+# the model. Extend per deployment with settings.fastpath_extra_vocabulary.
+FASTPATH_VOCABULARY = frozenset({
+    # activities
+    "review", "reviewed", "draft", "drafted", "revise", "revised", "edit",
+    "edited", "prepare", "prepared", "analyze", "analyzed", "research",
+    "researched", "attend", "attended", "call", "calls", "telephone",
+    "conference", "conferences", "meeting", "meet", "met", "email", "emails",
+    "correspondence", "letter", "letters", "memo", "memorandum", "file",
+    "filed", "serve", "served", "finalize", "finalized", "update", "updated",
+    "summarize", "summarized", "outline", "exchange", "exchanged", "send",
+    "sent", "receive", "received", "confer", "conferred", "discuss",
+    "discussed", "discussion", "follow", "up", "client", "counsel",
+    "opposing", "court", "team", "partner", "associate", "paralegal",
+    # documents and matters
+    "motion", "brief", "complaint", "answer", "petition", "pleading",
+    "pleadings", "discovery", "interrogatories", "requests", "production",
+    "documents", "document", "deposition", "depositions", "transcript",
+    "transcripts", "exhibit", "exhibits", "subpoena", "contract", "contracts",
+    "agreement", "agreements", "amendment", "lease", "settlement", "order",
+    "hearing", "trial", "mediation", "status", "report", "notice", "notes",
+    "case", "matter", "strategy", "privilege", "log", "filing", "filings",
+    "comments", "issues", "terms", "schedule", "deadline",
+    "deadlines", "calendar", "compel", "dismiss", "summary", "judgment",
+    "drafts", "protective", "stipulation", "response", "responses", "reply",
+    "opposition", "appeal", "record", "records", "invoice", "budget",
+})
+
+# Shorthand routinely typed into narratives, expanded by the cleanup step
+ABBREVIATIONS = {
+    "t/c": "telephone conference",
+    "tc": "telephone conference",
+    "tel": "telephone",
+    "conf": "conference",
+    "corr": "correspondence",
+    "re:": "regarding",
+    "re": "regarding",
+    "w/": "with",
+    "docs": "documents",
+    "depo": "deposition",
+    "mtg": "meeting",
+}
+
+_WORD = re.compile(r"\b\w+\b")
+_NUMERIC = re.compile(r"^\d+(?:[.,/-]\d+)*$")
+_ABBREVIATION = re.compile(
+    r"(?<![\w/])(" + "|".join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True)) + r")(?![\w/])",
+    re.IGNORECASE,
+)
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.;:])")
+_REPEATED_PUNCT = re.compile(r"([,.;:])\1+")
+
+
+# ----------------- Rules tier -----------------
+
+
+class FastPathStats:
+    def __init__(self):
+        self.handled = 0
+        self.escalated = 0
+        self.reasons: dict[str, int] = {}
+
+    def escalate(self, reason: str) -> None:
+        self.escalated += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def stats(self) -> dict:
+        total = self.handled + self.escalated
+        return {
+            "enabled": settings.fastpath_enabled,
+            "handled": self.handled,
+            "escalated": self.escalated,
+            "handled_rate": (self.handled / total) if total else 0.0,
+            "escalation_reasons": dict(self.reasons),
+        }
+
+
+fast_path_stats = FastPathStats()
+
+
+def _clean(original: str) -> str:
+    """
+    Casing and punctuation cleanup on top of _simple_fallback_rewrite.
+    """
+    text = " ".join(original.split())
+    text = _ABBREVIATION.sub(lambda m: ABBREVIATIONS[m.group(1).lower()], text)
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+    text = _REPEATED_PUNCT.sub(r"\1", text).rstrip(" ,;:")
+    return _simple_fallback_rewrite(text).standard
+
+
+def _substitute(text: str, forbidden: Optional[re.Pattern], substitutions: dict) -> Optional[str]:
+    """
+    Replace every forbidden term that has a client-approved substitute.
+    None if a forbidden term has no substitute (the model has to rephrase).
+    """
+    if forbidden is None:
+        return text
+    missing = False
+
+    def replace(m: re.Match) -> str:
+        nonlocal missing
+        key = " ".join(m.group(0).lower().split())
+        if key not in substitutions:
+            missing = True
+            return m.group(0)
+        return substitutions[key]
+
+    text = forbidden.sub(replace, text)
+    if missing:
+        return None
+    return text[0].upper() + text[1:]
+
+
+def _escalation_reason(text: str) -> Optional[str]:
+    if len(text) > settings.fastpath_max_chars:
+        return "length"
+    words = _WORD.findall(text.lower())
+    if not words or len(words) > settings.fastpath_max_words:
+        return "length"
+    meaningful = [w for w in words if w not in STOPWORDS and not _NUMERIC.match(w)]
+    if not meaningful:
+        return "vocabulary"
+    vocabulary = FASTPATH_VOCABULARY | {w.lower() for w in settings.fastpath_extra_vocabulary}
+    known = sum(1 for w in meaningful if w in vocabulary)
+    if known / len(meaningful) < settings.fastpath_min_known_ratio:
+        return "vocabulary"
+    return None
+
+
+def try_fast_path(
+    original: str,
+    hours: Optional[float] = None,
+    forbidden: Optional[re.Pattern] = None,
+    substitutions: Optional[dict] = None,
+) -> Optional[RewriteResponse]:
+    """
+    Rule-based rewrite for short, formulaic entries. Returns None when the
+    entry should escalate to the model:
+
+    - longer than settings.fastpath_max_words / fastpath_max_chars
+    - fewer than settings.fastpath_min_known_ratio of its meaningful words
+      are routine billing vocabulary
+    - it contains a client forbidden term with no substitute in the rules
+      (`term_substitutions`)
+    - the result fails the usual output validation
+    """
+    if not settings.fastpath_enabled:
+        return None
+
+    cleaned = _clean(original)
+    reason = _escalation_reason(cleaned)
+    if reason is not None:
+        fast_path_stats.escalate(reason)
+        return None
+
+    compliant = _substitute(cleaned, forbidden, substitutions or {})
+    if compliant is None:
+        fast_path_stats.escalate("forbidden_terms")
+        return None
+
+    rewrite = RewriteResponse(
+        standard=cleaned,
+        client_compliant=compliant,
+        audit_safe=compliant,
+        notes=FAST_PATH_NOTE,
+        tier=TIER_RULES,
+    )
+    if not default_validator.validate(original, rewrite, ValidationContext(hours=hours, forbidden=forbidden)).ok:
+        fast_path_stats.escalate("validation")
+        return None
+
+    fast_path_stats.handled += 1
+    return rewrite
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+
+# Crockford base32, as used by ULID
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 32)
+        chars.append(_ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+class UlidGenerator:
+    """
+    Monotonic ULIDs: 48-bit millisecond timestamp + 80 random bits, encoded
+    as 26 Crockford base32 characters, so string order among them is time
+    order.
+
+    Lists are still ordered by created_at / timestamp first, with the ID
+    only breaking ties: databases from before these IDs hold rows like
+    "TE-1718000000000", which sort after every "TE-01..." ULID.
+
+    - within one millisecond the random part is incremented rather than
+      redrawn, so IDs from one process are strictly increasing (and a
+      B-tree on them only ever appends)
+    - a clock that steps backwards keeps using the last timestamp
+    - different processes draw independent 80-bit random parts; a forked
+      child reseeds so it never continues the parent's sequence
+    """
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        # Also runs in a forked child, where the parent's lock may be held
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            elif self._last_random < _RANDOM_MAX:
+                self._last_random += 1
+            else:
+                # 2^80 IDs in one millisecond: borrow the next one
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            ms, rnd = self._last_ms, self._last_random
+        return _encode(ms, 10) + _encode(rnd, 16)
+
+
+_generator = UlidGenerator()
+
+
+def new_id(prefix: str) -> str:
+    """
+    e.g. new_id("TE") -> "TE-01JA2Q0M6T3X8Y7ZB5K4D9E1FH"
+    """
+    return f"{prefix}-{_generator.new()}"
+
@@ -0,0 +1,432 @@
+import asyncio
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import IO, Iterator, Optional
+
+from sqlalchemy import insert
+
+from .cache import cached_rewrite
+from .config import settings
+from .db import SessionLocal, run_in_db
+from .entries import build_saved_rows
+from .models import (
+    AuditEvent,
+    Client,
+    Job,
+    JobItem,
+)
+from .profiles import ClientProfile, client_profiles
+from .scheduler import PRIORITY_BULK
+from .billing import record_billing
+from .usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: parsing -> running -> completed | failed
+ACTIVE_JOB_STATUSES = ("parsing", "running")
+
+# (client_id, original, hours, error)
+ParsedRow = tuple[Optional[str], str, float, Optional[str]]
+
+
+# ----------------- File parsing -----------------
+
+CSV_CLIENT_COLUMNS = ("client_id", "client", "client_code")
+CSV_ORIGINAL_COLUMNS = ("original", "narrative", "description", "line_item_description")
+CSV_HOURS_COLUMNS = ("hours", "units", "line_item_number_of_units")
+
+
+def _pick(row: dict, names: tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        value = row.get(name)
+        if value is not None and value.strip():
+            return value.strip()
+    return None
+
+
+def _row(client_id: Optional[str], original: Optional[str], hours: Optional[str]) -> ParsedRow:
+    if not original:
+        return client_id, "", 0.0, "Missing narrative"
+    try:
+        return client_id, original, float(hours or ""), None
+    except ValueError:
+        return client_id, original, 0.0, f"Invalid hours: {hours!r}"
+
+
+def iter_csv_rows(fh: IO[str], default_client_id: Optional[str] = None) -> Iterator[ParsedRow]:
+    """
+    CSV with a header row. Column names are matched case-insensitively
+    against CSV_*_COLUMNS; client_id may come from the query string instead.
+    """
+    reader = csv.reader(fh)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [h.strip().lower() for h in header]
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        row = dict(zip(names, values))
+        yield _row(
+            _pick(row, CSV_CLIENT_COLUMNS) or default_client_id,
+            _pick(row, CSV_ORIGINAL_COLUMNS),
+            _pick(row, CSV_HOURS_COLUMNS),
+        )
+
+
+def _ledes_records(fh: IO[str]) -> Iterator[list[str]]:
+    buf = ""
+    for line in fh:
+        buf += line
+        while "[]" in buf:
+            record, buf = buf.split("[]", 1)
+            record = record.strip("\r\n")
+            if record:
+                yield record.split("|")
+
+
+def iter_ledes_rows(fh: IO[str], default_client_id: Optional[str] = None) -> Iterator[ParsedRow]:
+    """
+    LEDES 1998B: a LEDES1998B[] marker, a field-name record, then one
+    pipe-delimited record per line item, each terminated by []. Only fee
+    lines (EXP/FEE = F) are imported; units are hours.
+    """
+    records = _ledes_records(fh)
+    marker = next(records, None)
+    if marker is None:
+        return
+    if not marker[0].strip().upper().startswith("LEDES"):
+        raise ValueError("Not a LEDES file (missing LEDES1998B[] marker)")
+    header = next(records, None)
+    if header is None:
+        return
+    names = [h.strip().upper() for h in header]
+    for values in records:
+        row = dict(zip(names, (v.strip() for v in values)))
+        if row.get("EXP/FEE", "F").upper() != "F":
+            continue
+        yield _row(
+            row.get("CLIENT_ID") or default_client_id,
+            row.get("LINE_ITEM_DESCRIPTION"),
+            row.get("LINE_ITEM_NUMBER_OF_UNITS"),
+        )
+
+
+PARSERS = {"csv": iter_csv_rows, "ledes": iter_ledes_rows}
+
+
+# ----------------- Queue operations (sync, short transactions) -----------------
+
+
+def enqueue_rows(job_id: str, rows: Iterator[ParsedRow], on_chunk=None) -> int:
+    """
+    Insert parsed rows as job_items in chunks of settings.job_insert_chunk,
+    committing each chunk so workers can start before parsing finishes.
+    """
+    total = 0
+    chunk: list[dict] = []
+
+    def flush():
+        db = SessionLocal()
+        try:
+            db.execute(insert(JobItem), chunk)
+            db.query(Job).filter(Job.id == job_id).update(
+                {Job.total_items: Job.total_items + len(chunk)}, synchronize_session=False
+            )
+            failed = sum(1 for r in chunk if r["status"] == "failed")
+            if failed:
+                db.query(Job).filter(Job.id == job_id).update(
+                    {Job.failed_items: Job.failed_items + failed}, synchronize_session=False
+                )
+            db.commit()
+        finally:
+            db.close()
+        chunk.clear()
+        if on_chunk:
+            on_chunk()
+
+    for client_id, original, hours, error in rows:
+        chunk.append(
+            {
+                "job_id": job_id,
+                "seq": total,
+                "client_id": client_id,
+                "original": original,
+                "hours": hours,
+                "status": "failed" if error else "pending",
+                "error": error,
+                "updated_at": datetime.utcnow(),
+            }
+        )
+        total += 1
+        if len(chunk) >= settings.job_insert_chunk:
+            flush()
+    if chunk:
+        flush()
+    return total
+
+
+def _set_job_status(job_id: str, status: str, error: Optional[str] = None) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return
+        job.status = status
+        if error:
+            job.error = error
+        if status in ("completed", "failed"):
+            job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _finish_job_if_done(db, job_id: str) -> None:
+    job = db.get(Job, job_id)
+    if job is not None and job.status == "running" and job.done_items + job.failed_items >= job.total_items:
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def requeue_interrupted() -> int:
+    """
+    Called at startup: items left 'running' by a previous process go back to
+    'pending', and jobs whose upload was still being parsed are failed (the
+    uploaded file did not survive the restart). Completed items are never
+    touched, because an item's rows and its 'done' status commit together.
+    """
+    db = SessionLocal()
+    try:
+        requeued = (
+            db.query(JobItem)
+            .filter(JobItem.status == "running")
+            .update({"status": "pending"}, synchronize_session=False)
+        )
+        db.query(Job).filter(Job.status == "parsing").update(
+            {"status": "failed", "error": "Interrupted while parsing the upload", "finished_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+        for (job_id,) in db.query(Job.id).filter(Job.status == "running").all():
+            _finish_job_if_done(db, job_id)
+        return requeued
+    finally:
+        db.close()
+
+
+def claim_next_item() -> Optional[int]:
+    """
+    Atomically move the oldest pending item of an active job to 'running'.
+    """
+    db = SessionLocal()
+    try:
+        while True:
+            row = (
+                db.query(JobItem.id)
+                .join(Job, Job.id == JobItem.job_id)
+                .filter(JobItem.status == "pending", Job.status.in_(ACTIVE_JOB_STATUSES))
+                .order_by(JobItem.id)
+                .first()
+            )
+            if row is None:
+                return None
+            claimed = (
+                db.query(JobItem)
+                .filter(JobItem.id == row.id, JobItem.status == "pending")
+                .update({"status": "running", "updated_at": datetime.utcnow()}, synchronize_session=False)
+            )
+            db.commit()
+            if claimed:
+                return row.id
+    finally:
+        db.close()
+
+
+def _resolve_profile(db, client_ref: Optional[str]) -> Optional[ClientProfile]:
+    """
+    Imports may carry our client id or the client's billing code (LEDES).
+    """
+    if not client_ref:
+        return None
+    profile = client_profiles.get(db, client_ref)
+    if profile is not None:
+        return profile
+    row = db.query(Client.id).filter(Client.code == client_ref).first()
+    return client_profiles.get(db, row.id) if row else None
+
+
+def _load_item(db, item_id: int) -> tuple[JobItem, Job, Optional[ClientProfile]]:
+    item = db.get(JobItem, item_id)
+    job = item.job
+    return item, job, _resolve_profile(db, item.client_id)
+
+
+def _complete_item(db, item: JobItem, job: Job, profile: ClientProfile, rewrite) -> None:
+    now = datetime.utcnow()
+    rows, event, (time_entry_id, rewrite_id) = build_saved_rows(
+        profile, item.original, item.hours, rewrite, job.username, job.role, now
+    )
+    # The audit event commits with the item's done status, not through the
+    # write-behind writer, so a restart never sees one without the other
+    db.add_all(rows + [AuditEvent(**event)])
+    record_usage(db, [(now, profile.client_id, job.username, rewrite)])
+    record_billing(db, [(now, profile.client_id, item.hours, rewrite)])
+    item.status = "done"
+    item.time_entry_id = time_entry_id
+    item.rewrite_id = rewrite_id
+    item.updated_at = now
+    job.done_items = Job.done_items + 1
+    db.commit()
+
+
+def _fail_item(db, item_id: int, error: Exception) -> None:
+    db.rollback()
+    item = db.get(JobItem, item_id)
+    item.status = "failed"
+    item.error = str(error)
+    item.updated_at = datetime.utcnow()
+    item.job.failed_items = Job.failed_items + 1
+    db.commit()
+
+
+def _fail_item_in_new_session(item_id: int, error: Exception) -> None:
+    """
+    _fail_item for when the item's own session is unusable.
+    """
+    db = SessionLocal()
+    try:
+        _fail_item(db, item_id, error)
+    finally:
+        db.close()
+
+
+async def process_item(item_id: int) -> None:
+    """
+    Rewrite one job item and write its TimeEntry / RewriteRecord / AuditEvent
+    in the same commit that marks it done. DB steps run on the DB thread
+    pool; only the rewrite itself runs on the event loop.
+    """
+    db = SessionLocal()
+    try:
+        job_id = None
+        try:
+            item, job, profile = await run_in_db(_load_item, db, item_id)
+            job_id = job.id
+            if profile is None:
+                raise ValueError(f"Client not found: {item.client_id!r}")
+
+            rewrite = await cached_rewrite(
+                original=item.original,
+                hours=item.hours,
+                profile=profile,
+                user=job.username,
+                priority=PRIORITY_BULK,
+            )
+            await run_in_db(_complete_item, db, item, job, profile, rewrite)
+        except Exception as e:
+            try:
+                await run_in_db(_fail_item, db, item_id, e)
+            except Exception:
+                logger.exception("Could not mark job item %s failed; retrying in a new session", item_id)
+                await run_in_db(_fail_item_in_new_session, item_id, e)
+
+        if job_id is not None:
+            await run_in_db(_finish_job_if_done, db, job_id)
+    finally:
+        db.close()
+
+
+# ----------------- Worker pool -----------------
+
+
+class JobWorkerPool:
+    """
+    In-process workers that drain job_items through the rewrite pipeline.
+    Started and stopped by the app lifespan in main.py.
+    """
+
+    def __init__(self):
+        self._workers: list[asyncio.Task] = []
+        self._parsers: set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self, workers: int) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        await run_in_db(requeue_interrupted)
+        self._workers = [asyncio.create_task(self._run()) for _ in range(max(0, workers))]
+
+    async def stop(self) -> None:
+        tasks = self._workers + list(self._parsers)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._parsers.clear()
+
+    def notify(self) -> None:
+        """Wake idle workers; safe to call from any thread."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def submit_upload(self, job_id: str, upload: IO[bytes], fmt: str, default_client_id: Optional[str]) -> None:
+        """
+        Parse an uploaded file in a worker thread and enqueue its rows.
+        """
+        task = asyncio.create_task(self._parse(job_id, upload, fmt, default_client_id))
+        self._parsers.add(task)
+        task.add_done_callback(self._parsers.discard)
+
+    async def _parse(self, job_id: str, upload: IO[bytes], fmt: str, default_client_id: Optional[str]) -> None:
+        def work():
+            try:
+                upload.seek(0)
+                text = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+                rows = PARSERS[fmt](text, default_client_id)
+                enqueue_rows(job_id, rows, on_chunk=self.notify)
+            finally:
+                upload.close()
+
+        try:
+            await asyncio.to_thread(work)
+        except Exception as e:
+            await run_in_db(_set_job_status, job_id, "failed", error=f"Could not parse upload: {e}")
+            return
+
+        def activate():
+            _set_job_status(job_id, "running")
+            db = SessionLocal()
+            try:
+                _finish_job_if_done(db, job_id)
+            finally:
+                db.close()
+
+        await run_in_db(activate)
+        self.notify()
+
+    async def _run(self) -> None:
+        # A DB error (say "database is locked") must not end the worker: log
+        # it, back off and carry on. An item left 'running' by a failure here
+        # is requeued on the next start (requeue_interrupted).
+        while True:
+            try:
+                item_id = await run_in_db(claim_next_item)
+                if item_id is None:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=settings.job_poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wake.clear()
+                    continue
+                await process_item(item_id)
+            except Exception:
+                logger.exception("Job worker failed; retrying in %.1fs", settings.job_error_backoff)
+                await asyncio.sleep(settings.job_error_backoff)
+
+
+job_pool = JobWorkerPool()
@@ -1,69 +1,24 @@
 import json
 import re
-from typing import Optional
-
-import httpx
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
+from .backends import Backend, get_backend_pool
 from .config import settings
-from .schemas import RewriteResponse
-
-# ----------------- Drift config (tuned to be more forgiving) -----------------
-
-STOPWORDS = {
-    "the", "a", "an", "and", "or", "but", "of", "to", "in", "on", "for", "with",
-    "by", "at", "from", "as", "is", "are", "was", "were", "be", "been", "being",
-    "this", "that", "these", "those", "it", "its", "into", "about",
-    "regarding", "related", "re", "re:"
-}
-
-# Tokens we REALLY do not want silently dropped (crude safety guard)
-MUST_PRESERVE_TOKENS = {"farts", "butt", "toilet", "poop", "nsfw"}
-
-# How much overlap between original and rewritten content we require
-# 0.30 = VERY forgiving (only huge semantic changes will trip it)
-DRIFT_MIN_OVERLAP = 0.30
-
-
-def _tokenize(text: str) -> list[str]:
-    words = re.findall(r"\b\w+\b", text.lower())
-    return [w for w in words if w not in STOPWORDS]
-
-
-def _too_much_drift(original: str, rewritten: str) -> bool:
-    """
-    Returns True only if the rewrite looks *radically* different
-    (very low overlap) OR if sensitive tokens were silently removed.
-
-    This version is much more forgiving than the old one, so the
-    model is trusted most of the time.
-    """
-    o_tokens = _tokenize(original)
-    r_tokens = _tokenize(rewritten)
-
-    o_set = set(o_tokens)
-    r_set = set(r_tokens)
-
-    if not o_set:
-        # Nothing meaningful in the original, nothing to compare
-        return False
-
-    missing = o_set - r_set
-    overlap_ratio = 1.0 - (len(missing) / len(o_set))
-
-    # Only flag drift if overlap is extremely low
-    if overlap_ratio < DRIFT_MIN_OVERLAP:
-        return True
-
-    # If we had any of our "must preserve" tokens originally and they vanished, be strict
-    for t in o_set:
-        if t in MUST_PRESERVE_TOKENS and t in missing:
-            return True
-
-    return False
+from .metrics import llm_calls_total, llm_queue_wait_seconds, record_fallback, record_generation
+from .scheduler import PRIORITY_INTERACTIVE, llm_scheduler
+from .schemas import RewriteResponse, RewriteTelemetry
+from .validation import ValidationContext, default_validator
 
+if TYPE_CHECKING:
+    import httpx
 
 # ----------------- System prompt -----------------
 
+# Bump whenever SYSTEM_PROMPT or the user prompt layout changes, so cached
+# rewrites produced by an older prompt are not served.
+PROMPT_VERSION = "3"
+
 SYSTEM_PROMPT = """
 You are an AI legal billing assistant for a law firm.
 
@@ -91,8 +46,30 @@ Do not include any explanation outside the JSON.
 """.strip()
 
 
+# ----------------- Tiers -----------------
+
+# Which tier produced a rewrite; recorded as RewriteResponse.tier and
+# RewriteRecord.tier. The rules tier lives in app/fastpath.py.
+TIER_RULES = "rules"
+TIER_LLM = "llm"
+TIER_FALLBACK = "fallback"
+
+
 # ----------------- Fallback behavior -----------------
 
+FALLBACK_NOTE = (
+    "LLM rewrite was rejected due to potential semantic change or invalid output. "
+    "Using a minimal cleaned version that preserves the original wording."
+)
+
+
+def is_fallback(rewrite: RewriteResponse) -> bool:
+    """
+    True if the rewrite came from _simple_fallback_rewrite rather than the model.
+    """
+    return rewrite.notes == FALLBACK_NOTE
+
+
 def _simple_fallback_rewrite(original: str) -> RewriteResponse:
     """
     Minimal "safe" rewrite used only when the LLM output is totally unusable.
@@ -102,16 +79,12 @@ def _simple_fallback_rewrite(original: str) -> RewriteResponse:
     if not text.endswith("."):
         text += "."
 
-    note = (
-        "LLM rewrite was rejected due to potential semantic change or invalid output. "
-        "Using a minimal cleaned version that preserves the original wording."
-    )
-
     return RewriteResponse(
         standard=text,
         client_compliant=text,
         audit_safe=text,
-        notes=note,
+        notes=FALLBACK_NOTE,
+        tier=TIER_FALLBACK,
     )
 
 
@@ -135,68 +108,375 @@ def _extract_json(text: str) -> dict:
     raise ValueError(f"Could not parse JSON from model output: {text!r}")
 
 
-# ----------------- Main entrypoint -----------------
+# ----------------- Shared HTTP client -----------------
+
+# One pooled client per process, opened/closed by the app lifespan in main.py.
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+def _build_http_client() -> "httpx.AsyncClient":
+    # Imported here rather than at module load: only a running server needs it
+    import httpx
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.ollama_timeout, connect=settings.ollama_connect_timeout
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_keepalive_connections,
+            keepalive_expiry=settings.ollama_keepalive_expiry,
+        ),
+    )
 
-async def call_ollama(original: str, hours: float, rules: Optional[dict]) -> RewriteResponse:
+
+async def start_http_client() -> "httpx.AsyncClient":
     """
-    Call Ollama (qwen2.5:7b by default) and return a validated RewriteResponse.
+    Create the shared Ollama client (called once at startup).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
 
-    - If LLM output is invalid JSON => fallback
-    - If drift is *extreme* => fallback
-    - Otherwise, trust the model's rewrite
+
+async def close_http_client() -> None:
+    """
+    Close the shared Ollama client and its pooled connections (called at shutdown).
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """
+    Return the shared client, creating it lazily when used outside the app
+    lifespan (scripts, ad-hoc calls).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+# ----------------- Incremental JSON parsing (streaming) -----------------
+
+STREAM_FIELDS = ("standard", "client_compliant", "audit_safe", "notes")
+
+
+class _JsonFieldStream:
+    """
+    Feed model output chunk by chunk; returns each top-level string field of
+    the JSON object as soon as its closing quote arrives.
+
+    This is deliberately tiny: it only tracks nesting depth and string state,
+    which is all we need to spot `"key": "value"` pairs at depth 1. Any text
+    before the first `{` (model chatter) is ignored. The full text is still
+    parsed with _extract_json at the end, so this never decides validity.
     """
-    rules = rules or {}
-    user_prompt = f"""
-Hours: {hours}
-Original narrative: {original}
+
+    def __init__(self, fields=STREAM_FIELDS):
+        self.fields = set(fields)
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.buf: list[str] = []
+        self.pending_key: Optional[str] = None
+        self.expect_value = False
+        self.emitted: set[str] = set()
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        done: list[tuple[str, str]] = []
+        for ch in chunk:
+            if self.in_string:
+                self.buf.append(ch)
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self._string_done(done)
+                continue
+
+            if ch == '"':
+                if self.depth >= 1:
+                    self.in_string = True
+                    self.buf = ['"']
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth = max(0, self.depth - 1)
+            elif self.depth == 1:
+                if ch == ":":
+                    self.expect_value = True
+                elif ch == ",":
+                    self.expect_value = False
+                    self.pending_key = None
+        return done
+
+    def _string_done(self, done: list[tuple[str, str]]) -> None:
+        try:
+            value = json.loads("".join(self.buf))
+        except ValueError:
+            return
+        if not self.expect_value:
+            self.pending_key = value
+            return
+        key, self.pending_key, self.expect_value = self.pending_key, None, False
+        if key in self.fields and key not in self.emitted:
+            self.emitted.add(key)
+            done.append((key, value))
+
+
+# ----------------- Prompt + validation -----------------
+
+
+def build_prompt_prefix(rules: Optional[dict]) -> str:
+    """
+    The part of the prompt that only depends on the client rules. It comes
+    first so that every request for a client shares a byte-identical prefix,
+    which lets Ollama reuse its prompt KV cache.
+    """
+    return f"""{SYSTEM_PROMPT}
 
 Client rules (JSON):
-{json.dumps(rules, indent=2)}
-""".strip()
+{json.dumps(rules or {}, indent=2)}
 
-    try:
-        async with httpx.AsyncClient(timeout=90.0) as client:
-            resp = await client.post(
-                settings.ollama_url,
-                json={
-                    "model": settings.model_name,
-                    "prompt": SYSTEM_PROMPT + "\n\n" + user_prompt,
-                    "stream": False,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            raw_text = data.get("response", "")
-    except Exception:
-        # Network / Ollama error
-        return _simple_fallback_rewrite(original)
+"""
+
+
+def _build_prompt(
+    original: str,
+    hours: float,
+    rules: Optional[dict],
+    prompt_prefix: Optional[str] = None,
+) -> str:
+    if prompt_prefix is None:
+        prompt_prefix = build_prompt_prefix(rules)
+    return prompt_prefix + f"Hours: {hours}\nOriginal narrative: {original}"
+
+
+def _finalize(
+    original: str,
+    raw_text: str,
+    hours: Optional[float] = None,
+    forbidden: Optional[re.Pattern] = None,
+) -> RewriteResponse:
+    """
+    Turn raw model text into a validated RewriteResponse.
 
+    - If LLM output is invalid JSON => fallback
+    - If any variant fails a rejecting check in app/validation.py
+      (extreme drift, dropped must-preserve tokens, changed numbers,
+      introduced forbidden terms) => fallback
+    - Otherwise, trust the model's rewrite
+    """
     # Try to parse JSON from the model response
     try:
         parsed = _extract_json(raw_text)
     except Exception:
+        record_fallback("json")
         return _simple_fallback_rewrite(original)
 
     # Validate the structure
     for key in ["standard", "client_compliant", "audit_safe"]:
         if key not in parsed or not isinstance(parsed[key], str):
+            record_fallback("keys")
             return _simple_fallback_rewrite(original)
 
     notes = parsed.get("notes", "")
     if not isinstance(notes, str):
         notes = str(notes)
 
-    standard = parsed["standard"].strip()
-    client_compliant = parsed["client_compliant"].strip()
-    audit_safe = parsed["audit_safe"].strip()
+    rewrite = RewriteResponse(
+        standard=parsed["standard"].strip(),
+        client_compliant=parsed["client_compliant"].strip(),
+        audit_safe=parsed["audit_safe"].strip(),
+        notes=notes.strip(),
+        tier=TIER_LLM,
+    )
 
     # Only reject when the change is extreme
-    if _too_much_drift(original, standard):
+    result = default_validator.validate(
+        original, rewrite, ValidationContext(hours=hours, forbidden=forbidden)
+    )
+    if not result.ok:
+        record_fallback(result.rejections[0].check)
         return _simple_fallback_rewrite(original)
 
-    return RewriteResponse(
-        standard=standard,
-        client_compliant=client_compliant,
-        audit_safe=audit_safe,
-        notes=notes.strip(),
+    return rewrite
+
+
+# ----------------- Main entrypoint -----------------
+
+def _telemetry(backend: Backend, data: dict, elapsed: float) -> RewriteTelemetry:
+    return RewriteTelemetry(
+        model_name=settings.model_name,
+        backend=backend.base_url,
+        prompt_tokens=data.get("prompt_eval_count") or 0,
+        completion_tokens=data.get("eval_count") or 0,
+        duration_ms=round(elapsed * 1000),
     )
+
+
+async def _generate(prompt: str) -> tuple[dict, RewriteTelemetry]:
+    """
+    Non-streaming generation against the backend pool. Tries up to
+    settings.ollama_max_attempts different backends; raises the last error
+    when all of them fail.
+
+    Returns Ollama's whole answer ("response" plus the token counts and
+    durations recorded in app/metrics.py) and its telemetry.
+    """
+    pool = get_backend_pool()
+    client = get_http_client()
+    tried: tuple[Backend, ...] = ()
+    last_error: Exception = RuntimeError("No Ollama backend configured")
+
+    for _ in range(max(1, settings.ollama_max_attempts)):
+        backend = pool.pick(exclude=tried)
+        if backend is None:
+            break
+        tried += (backend,)
+        start = time.perf_counter()
+        with pool.track(backend):
+            try:
+                resp = await client.post(
+                    backend.generate_url,
+                    json={
+                        "model": settings.model_name,
+                        "prompt": prompt,
+                        "stream": False,
+                    },
+                )
+                resp.raise_for_status()
+                data = resp.json()
+            except Exception as e:
+                pool.mark_failure(backend, e)
+                last_error = e
+                continue
+        elapsed = time.perf_counter() - start
+        pool.mark_success(backend, elapsed)
+        record_generation("sync", data, elapsed)
+        return data, _telemetry(backend, data, elapsed)
+
+    raise last_error
+
+
+async def call_ollama(
+    original: str,
+    hours: float,
+    rules: Optional[dict],
+    user: str = "anonymous",
+    priority: int = PRIORITY_INTERACTIVE,
+    prompt_prefix: Optional[str] = None,
+    forbidden: Optional[re.Pattern] = None,
+) -> RewriteResponse:
+    """
+    Call Ollama (qwen2.5:7b by default) and return a validated RewriteResponse.
+    See _finalize for the fallback rules.
+
+    The generation waits for a slot from llm_scheduler; QueueFullError is
+    raised (not turned into a fallback) when the queue is saturated. A
+    failing backend is retried on another one before falling back.
+
+    `prompt_prefix` is a precomputed build_prompt_prefix(rules) and
+    `forbidden` the client's compiled forbidden-terms matcher (both from
+    app/profiles.py); without a prefix one is built from `rules`.
+    """
+    llm_calls_total.inc("sync")
+    async with llm_scheduler.slot(user, priority) as waited:
+        llm_queue_wait_seconds.observe(waited, "sync")
+        try:
+            data, telemetry = await _generate(_build_prompt(original, hours, rules, prompt_prefix))
+        except Exception:
+            # Network / Ollama error on every backend tried
+            record_fallback("network")
+            return _simple_fallback_rewrite(original)
+
+    rewrite = _finalize(original, data.get("response", ""), hours=hours, forbidden=forbidden)
+    rewrite.telemetry = telemetry
+    return rewrite
+
+
+async def call_ollama_stream(
+    original: str,
+    hours: float,
+    rules: Optional[dict],
+    user: str = "anonymous",
+    priority: int = PRIORITY_INTERACTIVE,
+    prompt_prefix: Optional[str] = None,
+    forbidden: Optional[re.Pattern] = None,
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    Streaming variant of call_ollama.
+
+    Yields ("field", (name, value)) as each of STREAM_FIELDS completes in the
+    model output, then exactly one ("result", RewriteResponse) produced by the
+    same validation/fallback rules as call_ollama. The final result is
+    authoritative: if it is a fallback, previously streamed fields are void.
+
+    A backend that fails before sending any output is retried on another
+    one; once tokens have been streamed a failure falls back instead.
+    """
+    pool = get_backend_pool()
+    prompt = _build_prompt(original, hours, rules, prompt_prefix)
+    tried: tuple[Backend, ...] = ()
+
+    llm_calls_total.inc("stream")
+    async with llm_scheduler.slot(user, priority) as waited:
+        llm_queue_wait_seconds.observe(waited, "stream")
+        for _ in range(max(1, settings.ollama_max_attempts)):
+            backend = pool.pick(exclude=tried)
+            if backend is None:
+                break
+            tried += (backend,)
+            chunks: list[str] = []
+            final: dict = {}
+            fields = _JsonFieldStream()
+            start = time.perf_counter()
+            with pool.track(backend):
+                try:
+                    async with get_http_client().stream(
+                        "POST",
+                        backend.generate_url,
+                        json={
+                            "model": settings.model_name,
+                            "prompt": prompt,
+                            "stream": True,
+                        },
+                    ) as resp:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            if not line.strip():
+                                continue
+                            data = json.loads(line)
+                            piece = data.get("response", "")
+                            if piece:
+                                chunks.append(piece)
+                                for name, value in fields.feed(piece):
+                                    yield "field", (name, value)
+                            if data.get("done"):
+                                final = data
+                                break
+                except Exception as e:
+                    pool.mark_failure(backend, e)
+                    if chunks:
+                        # Partial output already sent; do not mix two generations
+                        break
+                    continue
+            elapsed = time.perf_counter() - start
+            pool.mark_success(backend, elapsed)
+            record_generation("stream", final, elapsed)
+            rewrite = _finalize(original, "".join(chunks), hours=hours, forbidden=forbidden)
+            rewrite.telemetry = _telemetry(backend, final, elapsed)
+            yield "result", rewrite
+            return
+
+    # Network / Ollama error
+    record_fallback("network")
+    yield "result", _simple_fallback_rewrite(original)
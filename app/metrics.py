@@ -0,0 +1,322 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .scheduler import llm_scheduler
+
+# ----------------- Metric types -----------------
+
+# Seconds; covers a 1 ms DB-only request up to a multi-minute generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+RATE_BUCKETS = (1, 2.5, 5, 10, 20, 40, 80, 160, 320)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: tuple) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, ([*s[0]], s[1], s[2])) for k, s in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class GaugeCallback(_Metric):
+    """
+    A gauge read from `fn` at scrape time (queue depths and the like), so
+    the hot path never updates it.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        return self.header() + [f"{self.name} {_fmt(self.fn())}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_callback(self, name: str, help: str, fn: Callable[[], float]) -> GaugeCallback:
+        return self.register(GaugeCallback(name, help, fn))
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+# ----------------- HTTP -----------------
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template, until the response is fully sent.",
+    ("method", "route", "status"),
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries",
+    "SQL statements executed while serving one request.",
+    ("method", "route"),
+    buckets=COUNT_BUCKETS,
+)
+db_queries_total = registry.counter("db_queries_total", "SQL statements executed (all callers).")
+
+# ----------------- LLM -----------------
+
+llm_calls_total = registry.counter(
+    "llm_calls_total", "Rewrites sent to the model (one per call_ollama / call_ollama_stream).", ("mode",)
+)
+llm_fallbacks_total = registry.counter(
+    "llm_fallbacks_total",
+    "Model rewrites replaced by the fallback, by cause: network, json, keys, drift, "
+    "or the name of another rejecting validation check.",
+    ("cause",),
+)
+llm_queue_wait_seconds = registry.histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for a generation slot (llm_scheduler).", ("mode",)
+)
+llm_request_seconds = registry.histogram(
+    "llm_request_seconds", "Time from the HTTP request to Ollama until its full answer.", ("mode",)
+)
+llm_load_seconds = registry.histogram("llm_load_seconds", "Ollama load_duration (model load).", ("mode",))
+llm_prompt_eval_seconds = registry.histogram(
+    "llm_prompt_eval_seconds", "Ollama prompt_eval_duration (prompt processing).", ("mode",)
+)
+llm_generation_seconds = registry.histogram(
+    "llm_generation_seconds", "Ollama eval_duration (token generation).", ("mode",)
+)
+llm_prompt_tokens_total = registry.counter(
+    "llm_prompt_tokens_total", "Prompt tokens evaluated (Ollama prompt_eval_count).", ("mode",)
+)
+llm_completion_tokens_total = registry.counter(
+    "llm_completion_tokens_total", "Tokens generated (Ollama eval_count).", ("mode",)
+)
+llm_tokens_per_second = registry.histogram(
+    "llm_tokens_per_second", "Generation speed: eval_count / eval_duration.", ("mode",), buckets=RATE_BUCKETS
+)
+
+llm_scheduler_active = registry.gauge_callback(
+    "llm_scheduler_active", "Generations holding a slot right now.", lambda: llm_scheduler.stats()["active"]
+)
+llm_scheduler_queued = registry.gauge_callback(
+    "llm_scheduler_queued", "Callers waiting for a generation slot.", lambda: llm_scheduler.stats()["queued"]
+)
+
+# Drift is the overlap check in app/validation.py
+_CHECK_CAUSES = {"overlap": "drift"}
+
+
+def record_fallback(cause: str) -> None:
+    llm_fallbacks_total.inc(_CHECK_CAUSES.get(cause, cause))
+
+
+def record_generation(mode: str, data: dict, elapsed: float) -> None:
+    """
+    `data` is Ollama's final /api/generate object; durations there are in
+    nanoseconds. Missing fields (older servers, stubs) are skipped.
+    """
+    llm_request_seconds.observe(elapsed, mode)
+    if data.get("load_duration"):
+        llm_load_seconds.observe(data["load_duration"] / 1e9, mode)
+    if data.get("prompt_eval_duration"):
+        llm_prompt_eval_seconds.observe(data["prompt_eval_duration"] / 1e9, mode)
+    if data.get("prompt_eval_count"):
+        llm_prompt_tokens_total.inc(mode, amount=data["prompt_eval_count"])
+    eval_count = data.get("eval_count")
+    eval_duration = data.get("eval_duration")
+    if eval_count:
+        llm_completion_tokens_total.inc(mode, amount=eval_count)
+    if eval_duration:
+        llm_generation_seconds.observe(eval_duration / 1e9, mode)
+        if eval_count:
+            llm_tokens_per_second.observe(eval_count / (eval_duration / 1e9), mode)
+
+
+# ----------------- DB query counting -----------------
+
+# A one-element list per request; run_in_db and the sync-endpoint threadpool
+# copy context, so every thread working for the request bumps the same list.
+_request_queries: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def instrument_engine(bind: Engine) -> None:
+    @event.listens_for(bind, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        db_queries_total.inc()
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+# ----------------- ASGI middleware -----------------
+
+
+def route_template(scope) -> str:
+    """
+    The matched route as a template (/jobs/{job_id}). Built from the path
+    and its path_params, since the route object may only know its path
+    relative to the router it was included from.
+    """
+    if scope.get("route") is None:
+        return "<unmatched>"
+    params = {str(v): k for k, v in (scope.get("path_params") or {}).items()}
+    segments = []
+    for segment in scope["path"].split("/"):
+        name = params.pop(segment, None)
+        segments.append("{" + name + "}" if name else segment)
+    return "/".join(segments)
+
+
+class MetricsMiddleware:
+    """
+    Records http_request_duration_seconds and http_request_db_queries.
+
+    Labels use the matched route template (/jobs/{job_id}), never the raw
+    path, so the number of series stays bounded; unmatched paths share one
+    label. Plain ASGI rather than BaseHTTPMiddleware so streaming responses
+    pass straight through.
+    """
+
+    def __init__(self, app, skip_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        counter = [0]
+        token = _request_queries.set(counter)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            template = route_template(scope)
+            method = scope["method"]
+            http_request_seconds.observe(elapsed, method, template, status)
+            http_request_db_queries.observe(counter[0], method, template)
@@ -8,6 +8,7 @@ from sqlalchemy import (
     Text,
     Boolean,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.orm import relationship, Session
 
@@ -47,11 +48,20 @@ class TimeEntry(Base):
     client_id = Column(String, ForeignKey("clients.id"), nullable=False)
     original = Column(Text, nullable=False)
     hours = Column(Float, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Who saved the entry; scopes GET /rewrites/recent
+    username = Column(String, nullable=True)
+    # Indexed for the week-by-week billing summary rebuild (app/billing.py)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     client = relationship("Client", back_populates="time_entries")
     rewrites = relationship("RewriteRecord", back_populates="time_entry")
 
+    # Keyset pagination on (created_at, id) per user, optionally per client
+    __table_args__ = (
+        Index("ix_time_entries_username_created_id", "username", "created_at", "id"),
+        Index("ix_time_entries_username_client_created_id", "username", "client_id", "created_at", "id"),
+    )
+
 
 class RewriteRecord(Base):
     __tablename__ = "rewrites"
@@ -62,10 +72,23 @@ class RewriteRecord(Base):
     client_compliant = Column(Text, nullable=False)
     audit_safe = Column(Text, nullable=False)
     notes = Column(Text, nullable=True)
+    # "rules" | "llm" | "fallback", see RewriteResponse.tier
+    tier = Column(String, nullable=True, index=True)
+    # Model call telemetry (RewriteTelemetry); NULL when no call was made
+    llm_backend = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    llm_duration_ms = Column(Integer, nullable=True)
+    is_fallback = Column(Boolean, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     time_entry = relationship("TimeEntry", back_populates="rewrites")
 
+    # Latest rewrite per entry (GET /rewrites/recent)
+    __table_args__ = (
+        Index("ix_rewrites_time_entry_created_id", "time_entry_id", "created_at", "id"),
+    )
+
 
 class AuditEvent(Base):
     __tablename__ = "audit_events"
@@ -79,6 +102,143 @@ class AuditEvent(Base):
     rewrite_id = Column(String, ForeignKey("rewrites.id"), nullable=False)
     model_name = Column(String, nullable=False)
     rules_snapshot = Column(Text, nullable=False)
+    # Same telemetry as the rewrite, so an audit trail stands on its own
+    llm_backend = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    llm_duration_ms = Column(Integer, nullable=True)
+    is_fallback = Column(Boolean, nullable=True)
+
+    # Keyset pagination on (timestamp, id), optionally filtered by client or
+    # user (GET /admin/audit-events)
+    __table_args__ = (
+        Index("ix_audit_events_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_events_client_timestamp_id", "client_id", "timestamp", "id"),
+        Index("ix_audit_events_username_timestamp_id", "username", "timestamp", "id"),
+    )
+
+
+class Job(Base):
+    """
+    A bulk import (CSV / LEDES upload) drained by the worker pool in app/jobs.py.
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    username = Column(String, nullable=False, index=True)
+    role = Column(String, nullable=False)
+    filename = Column(String, nullable=True)
+    format = Column(String, nullable=False)  # "csv" or "ledes"
+    status = Column(String, nullable=False, default="parsing")  # parsing|running|completed|failed
+    total_items = Column(Integer, nullable=False, default=0)
+    done_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("JobItem", back_populates="job")
+
+
+class JobItem(Base):
+    __tablename__ = "job_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String, ForeignKey("jobs.id"), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)  # position in the uploaded file
+    client_id = Column(String, nullable=True)
+    original = Column(Text, nullable=False)
+    hours = Column(Float, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending|running|done|failed
+    error = Column(Text, nullable=True)
+    time_entry_id = Column(String, nullable=True)
+    rewrite_id = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    job = relationship("Job", back_populates="items")
+
+
+class RewriteCacheEntry(Base):
+    """
+    Persistent tier of the rewrite cache (see app/cache.py).
+    """
+
+    __tablename__ = "rewrite_cache"
+
+    key = Column(String, primary_key=True)
+    client_id = Column(String, nullable=True, index=True)
+    payload = Column(Text, nullable=False)  # RewriteResponse as JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UsageDaily(Base):
+    """
+    Daily rewrite/LLM usage per client, model and user, kept up to date in
+    the transaction that saves each rewrite (app/usage.py).
+    """
+
+    __tablename__ = "usage_daily"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD, UTC
+    client_id = Column(String, primary_key=True)
+    model_name = Column(String, primary_key=True)
+    username = Column(String, primary_key=True)
+    rewrites = Column(Integer, nullable=False, default=0)
+    llm_calls = Column(Integer, nullable=False, default=0)
+    fallbacks = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    llm_duration_ms = Column(Integer, nullable=False, default=0)
+
+
+class UsageDailyLatency(Base):
+    """
+    LLM latency histogram for each usage_daily row: calls per bucket, where
+    `le_ms` is the bucket's upper bound (app/usage.py LATENCY_BOUNDS_MS).
+    """
+
+    __tablename__ = "usage_daily_latency"
+
+    day = Column(String, primary_key=True)
+    client_id = Column(String, primary_key=True)
+    model_name = Column(String, primary_key=True)
+    username = Column(String, primary_key=True)
+    le_ms = Column(Integer, primary_key=True)
+    calls = Column(Integer, nullable=False, default=0)
+
+
+class BillingDaily(Base):
+    """
+    Entries, hours and fallbacks saved per client and day (UTC), kept up to
+    date in the transaction that saves each entry (app/billing.py).
+    """
+
+    __tablename__ = "billing_daily"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    client_id = Column(String, primary_key=True)
+    entries = Column(Integer, nullable=False, default=0)
+    hours = Column(Float, nullable=False, default=0.0)
+    fallbacks = Column(Integer, nullable=False, default=0)
+    rules_entries = Column(Integer, nullable=False, default=0)
+    llm_entries = Column(Integer, nullable=False, default=0)
+
+
+class BillingWeekly(Base):
+    """
+    Same as BillingDaily per ISO week, keyed by the week's Monday.
+    """
+
+    __tablename__ = "billing_weekly"
+
+    week = Column(String, primary_key=True)  # YYYY-MM-DD of the Monday
+    client_id = Column(String, primary_key=True)
+    entries = Column(Integer, nullable=False, default=0)
+    hours = Column(Float, nullable=False, default=0.0)
+    fallbacks = Column(Integer, nullable=False, default=0)
+    rules_entries = Column(Integer, nullable=False, default=0)
+    llm_entries = Column(Integer, nullable=False, default=0)
 
 
 # Demo client rules – still here, but we’ll *augment* these with guidelines/examples
@@ -87,6 +247,7 @@ DEMO_RULES_BY_CLIENT_ID = {
         "client_name": "Acme Manufacturing",
         "style": "formal litigation billing style",
         "forbidden_terms": ["email review", "miscellaneous"],
+        "term_substitutions": {"email review": "review and analysis of correspondence"},
         "required_elements": [
             "Include subject of work",
             "Mention that correspondence was reviewed and analyzed",
@@ -115,6 +276,41 @@ DEMO_RULES_BY_CLIENT_ID = {
 }
 
 
+def build_client_rules(client: Client) -> dict:
+    """
+    Effective rules for a client: static demo rules (DEMO_RULES_BY_CLIENT_ID)
+    plus any billing_guidelines / accepted_examples / denied_examples an
+    admin configured for it.
+    """
+    rules = DEMO_RULES_BY_CLIENT_ID.get(client.id, {}).copy()
+    if client.billing_guidelines:
+        rules["billing_guidelines"] = client.billing_guidelines
+    if client.accepted_examples:
+        rules["accepted_examples"] = client.accepted_examples
+    if client.denied_examples:
+        rules["denied_examples"] = client.denied_examples
+    return rules
+
+
+def backfill_time_entry_usernames(bind) -> int:
+    """
+    time_entries.username was added after entries were already being saved;
+    recover the owner of older entries from their audit events.
+    """
+    from sqlalchemy import text
+
+    with bind.begin() as conn:
+        result = conn.execute(
+            text(
+                "UPDATE time_entries SET username = ("
+                " SELECT audit_events.username FROM audit_events"
+                " WHERE audit_events.time_entry_id = time_entries.id LIMIT 1"
+                ") WHERE username IS NULL"
+            )
+        )
+        return result.rowcount
+
+
 def seed_demo_clients_and_admin():
     """
     Seed demo clients and users (admin/demo) if DB is empty.
@@ -152,10 +348,11 @@ def seed_demo_clients_and_admin():
             db.add_all(demo_clients)
             db.commit()
 
-        # Seed users: admin/admin123 and demo/demo123
-        from .auth import get_password_hash
-
+        # Seed users: admin/admin123 and demo/demo123. Only an empty users
+        # table pays for bcrypt (and for importing passlib).
         if db.query(User).count() == 0:
+            from .auth import get_password_hash
+
             admin_user = User(
                 username="admin",
                 password_hash=get_password_hash("admin123"),
@@ -0,0 +1,27 @@
+import base64
+from datetime import datetime
+from typing import Optional
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, id: str) -> str:
+    """
+    Opaque keyset cursor for lists ordered by (timestamp, id) descending.
+    """
+    raw = f"{timestamp.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, str]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        ts, id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), id
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+
+from .config import settings
+from .models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The authenticated caller as endpoints see it (get_current_user). A plain
+    value rather than the ORM User, so it can be shared across requests
+    without being tied to any session.
+    """
+
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, username=user.username, role=user.role, is_active=user.is_active)
+
+
+class PrincipalCache:
+    """
+    Verified bearer token -> Principal, so hot endpoints authenticate
+    without decoding the JWT or querying users.
+
+    - entries live for settings.auth_cache_ttl_seconds, never past the
+      token's own expiry; LRU-bounded at settings.auth_cache_max_entries
+    - any update or delete of a User through the ORM in this process drops
+      that user's entries (delete_user, deactivation, role changes); other
+      worker processes catch up within the TTL
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        # token -> (expires_at, principal)
+        self._entries: "OrderedDict[str, tuple[float, Principal]]" = OrderedDict()
+        self._tokens_by_user: dict[int, set[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _drop(self, token: str) -> None:
+        _, principal = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+    def get(self, token: str) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._entries.get(token)
+            if item is not None:
+                expires_at, principal = item
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return principal
+                self._drop(token)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float] = None) -> None:
+        """
+        `token_exp` is the JWT's exp claim (epoch seconds).
+        """
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+            if ttl <= 0:
+                return
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+            self._entries[token] = (time.monotonic() + ttl, principal)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._drop(token)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    principal_cache.invalidate_user(target.id)
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import run_in_db
+from .examples import ExampleIndex, ExampleSelection, select_examples, split_examples
+from .llm import build_prompt_prefix
+from .models import Client, build_client_rules
+from .schemas import ClientOut
+
+
+def rules_hash(rules: Optional[dict]) -> str:
+    """
+    Stable hash of the effective rules dict (key order does not matter).
+    """
+    blob = json.dumps(rules or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def compile_terms(terms: list[str]) -> Optional[re.Pattern]:
+    """
+    One case-insensitive alternation for all terms, longest first so that
+    "email review" wins over "email". Word boundaries only where the term
+    starts/ends with a word character.
+    """
+    cleaned = sorted({t.strip() for t in terms if t and t.strip()}, key=len, reverse=True)
+    if not cleaned:
+        return None
+    parts = []
+    for term in cleaned:
+        body = r"\s+".join(re.escape(w) for w in term.split())
+        left = r"\b" if term[0].isalnum() else ""
+        right = r"\b" if term[-1].isalnum() else ""
+        parts.append(left + body + right)
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+def term_substitutions(rules: Optional[dict]) -> dict:
+    """
+    The rules' optional `term_substitutions` ({forbidden term: replacement}),
+    keyed by lowercase, whitespace-normalized term.
+    """
+    subs = (rules or {}).get("term_substitutions") or {}
+    return {" ".join(k.lower().split()): v for k, v in subs.items() if k and k.strip()}
+
+
+@dataclass(frozen=True)
+class ClientProfile:
+    """
+    Everything a rewrite needs about a client, computed once per client.
+    """
+
+    client: ClientOut
+    rules: dict
+    rules_json: str  # stored verbatim as AuditEvent.rules_snapshot
+    rules_hash: str  # part of the rewrite cache key
+    prompt_prefix: str  # byte-identical per client, see llm.build_prompt_prefix
+    forbidden: Optional[re.Pattern]
+    substitutions: dict  # forbidden term (lowercase) -> approved wording
+    accepted_examples: ExampleIndex
+    denied_examples: ExampleIndex
+    built_at: float
+
+    @property
+    def client_id(self) -> str:
+        return self.client.id
+
+    def select_examples(self, original: str) -> ExampleSelection:
+        return select_examples(
+            original,
+            self.accepted_examples,
+            self.denied_examples,
+            top_k=settings.examples_top_k,
+            token_budget=settings.examples_token_budget,
+        )
+
+
+def compile_profile(client: Client) -> ClientProfile:
+    rules = build_client_rules(client)
+    # Examples are selected per request (app/examples.py), so they stay out
+    # of the stable prefix
+    prefix_rules = {
+        k: v for k, v in rules.items() if k not in ("accepted_examples", "denied_examples")
+    }
+    return ClientProfile(
+        client=ClientOut.model_validate(client),
+        rules=rules,
+        rules_json=json.dumps(rules),
+        rules_hash=rules_hash(rules),
+        prompt_prefix=build_prompt_prefix(prefix_rules),
+        forbidden=compile_terms(rules.get("forbidden_terms") or []),
+        substitutions=term_substitutions(rules),
+        accepted_examples=ExampleIndex(split_examples(rules.get("accepted_examples"))),
+        denied_examples=ExampleIndex(split_examples(rules.get("denied_examples"))),
+        built_at=time.monotonic(),
+    )
+
+
+class ProfileRegistry:
+    """
+    Per-process cache of compiled client profiles.
+
+    Admin client endpoints call invalidate() after they write. Other worker
+    processes do not see that call, so profiles also expire after
+    settings.client_profile_ttl_seconds to bound how long they can be stale.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._profiles: dict[str, ClientProfile] = {}
+        self.builds = 0
+
+    def _fresh(self, client_id: str) -> Optional[ClientProfile]:
+        with self._lock:
+            profile = self._profiles.get(client_id)
+        if profile is not None and time.monotonic() - profile.built_at < self.ttl:
+            return profile
+        return None
+
+    def get(self, db: Session, client_id: str) -> Optional[ClientProfile]:
+        profile = self._fresh(client_id)
+        if profile is not None:
+            return profile
+
+        client = db.query(Client).filter(Client.id == client_id).first()
+        if client is None:
+            self.invalidate(client_id)
+            return None
+
+        profile = compile_profile(client)
+        with self._lock:
+            self._profiles[client_id] = profile
+            self.builds += 1
+        return profile
+
+    async def aget(self, db: Session, client_id: str) -> Optional[ClientProfile]:
+        """
+        get() for async callers; only a rebuild touches the DB thread pool.
+        """
+        profile = self._fresh(client_id)
+        if profile is not None:
+            return profile
+        return await run_in_db(self.get, db, client_id)
+
+    def invalidate(self, client_id: str) -> None:
+        with self._lock:
+            self._profiles.pop(client_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+client_profiles = ProfileRegistry(ttl_seconds=settings.client_profile_ttl_seconds)
@@ -1,46 +1,53 @@
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 
-from ..auth import get_password_hash
-from ..db import SessionLocal
-from ..deps import require_admin
+from ..audit import audit_writer
+from ..auth import password_hasher
+from ..backends import get_backend_pool
+from ..billing import billing_report
+from ..db import run_in_db
+from ..cache import rewrite_cache, rewrite_flights
+from ..fastpath import fast_path_stats
+from ..principals import principal_cache
+from ..usage import usage_report
+from ..pagination import InvalidCursor, decode_cursor, encode_cursor
+from ..profiles import client_profiles
+from ..scheduler import llm_scheduler
+from ..deps import get_db, report_range, require_admin
 from ..models import User, AuditEvent, TimeEntry, RewriteRecord, Client
 from ..schemas import (
     UserCreate,
     UserOut,
+    UserUpdate,
     AuditEntryOut,
     ClientOut,
     RewriteResponse,
     ClientAdminCreate,
     ClientAdminUpdate,
     ClientAdminDetail,
+    UsageReport,
+    BillingReport,
 )
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # =========================
 # User management (existing)
 # =========================
 
 
 @router.post("/users", response_model=UserOut)
-def create_user(
+async def create_user(
     payload: UserCreate,
     db: Session = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    existing = db.query(User).filter(User.username == payload.username).first()
+    existing = await run_in_db(_user_by_username, db, payload.username)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists"
@@ -48,14 +55,22 @@ def create_user(
 
     user = User(
         username=payload.username,
-        password_hash=get_password_hash(payload.password),
+        password_hash=await password_hasher.hash(payload.password),
         role=payload.role,
         is_active=True,
     )
+    await run_in_db(_add_user, db, user)
+    return user
+
+
+def _user_by_username(db: Session, username: str) -> Optional[User]:
+    return db.query(User).filter(User.username == username).first()
+
+
+def _add_user(db: Session, user: User) -> None:
     db.add(user)
     db.commit()
     db.refresh(user)
-    return user
 
 
 @router.get("/users", response_model=List[UserOut])
@@ -80,9 +95,36 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
     return {"status": "deleted"}
 
 
+@router.patch("/users/{user_id}", response_model=UserOut)
+def update_user(
+    user_id: int,
+    payload: UserUpdate,
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if user.username == "admin" and (payload.is_active is False or payload.role not in (None, "admin")):
+        raise HTTPException(status_code=400, detail="Cannot demote or deactivate built-in admin user")
+
+    if payload.role is not None:
+        user.role = payload.role
+    if payload.is_active is not None:
+        user.is_active = payload.is_active
+
+    db.commit()
+    db.refresh(user)
+    # Again after the commit: a request racing the flush may have re-cached
+    # the old row
+    principal_cache.invalidate_user(user_id)
+    return user
+
+
 # =========================
 # Admin client management
 # =========================
@@ -121,6 +163,7 @@ def admin_create_client(
     db.add(client)
     db.commit()
     db.refresh(client)
+    client_profiles.invalidate(client.id)
     return client
 
 
@@ -135,6 +178,12 @@ def admin_update_client(
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
 
+    guidelines_changed = (
+        client.billing_guidelines != payload.billing_guidelines
+        or client.accepted_examples != payload.accepted_examples
+        or client.denied_examples != payload.denied_examples
+    )
+
     client.name = payload.name
     client.code = payload.code
     client.billing_guidelines = payload.billing_guidelines
@@ -143,6 +192,11 @@ def admin_update_client(
 
     db.commit()
     db.refresh(client)
+    client_profiles.invalidate(client_id)
+
+    # Cached rewrites were generated against the old guidelines
+    if guidelines_changed:
+        rewrite_cache.invalidate_client(client_id)
     return client
 
 
@@ -162,50 +216,245 @@ def admin_delete_client(
 
     db.delete(client)
     db.commit()
+    client_profiles.invalidate(client_id)
+    rewrite_cache.invalidate_client(client_id)
     return {"status": "deleted"}
 
 
+# =========================
+# Rewrite cache
+# =========================
+
+
+@router.get("/rewrite-cache")
+def rewrite_cache_stats(admin=Depends(require_admin)):
+    return {
+        **rewrite_cache.stats(),
+        "single_flight": rewrite_flights.stats(),
+        "fast_path": fast_path_stats.stats(),
+    }
+
+
+@router.delete("/rewrite-cache")
+def rewrite_cache_clear(admin=Depends(require_admin)):
+    rewrite_cache.clear()
+    return {"status": "cleared"}
+
+
+@router.get("/auth-cache")
+def auth_cache_stats(admin=Depends(require_admin)):
+    return principal_cache.stats()
+
+
+@router.delete("/auth-cache")
+def auth_cache_clear(admin=Depends(require_admin)):
+    principal_cache.clear()
+    return {"status": "cleared"}
+
+
+@router.get("/password-hasher")
+def password_hasher_stats(admin=Depends(require_admin)):
+    return password_hasher.stats()
+
+
+@router.get("/audit-writer")
+def audit_writer_stats(admin=Depends(require_admin)):
+    return audit_writer.stats()
+
+
+@router.get("/llm-queue")
+def llm_queue_stats(admin=Depends(require_admin)):
+    return llm_scheduler.stats()
+
+
+@router.get("/llm-backends")
+def llm_backend_stats(admin=Depends(require_admin)):
+    return get_backend_pool().stats()
+
+
 # =========================
 # Audit trail (existing)
 # =========================
 
 
+AUDIT_EVENTS_MAX_LIMIT = 1000
+
+
+def query_audit_events(
+    db: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    client_id: Optional[str] = None,
+    username: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> tuple[list[AuditEntryOut], Optional[str]]:
+    """
+    One page of audit events, newest first, in a single joined query.
+    Returns the page and the cursor for the next one (None on the last page).
+    """
+    q = (
+        db.query(
+            AuditEvent,
+            TimeEntry.original,
+            RewriteRecord.standard,
+            RewriteRecord.client_compliant,
+            RewriteRecord.audit_safe,
+            RewriteRecord.notes,
+            RewriteRecord.tier,
+            Client,
+        )
+        .join(TimeEntry, TimeEntry.id == AuditEvent.time_entry_id)
+        .join(RewriteRecord, RewriteRecord.id == AuditEvent.rewrite_id)
+        .join(Client, Client.id == AuditEvent.client_id)
+    )
+    if client_id:
+        q = q.filter(AuditEvent.client_id == client_id)
+    if username:
+        q = q.filter(AuditEvent.username == username)
+    if since:
+        q = q.filter(AuditEvent.timestamp >= since)
+    if until:
+        q = q.filter(AuditEvent.timestamp < until)
+
+    after = decode_cursor(cursor)
+    if after:
+        q = q.filter(tuple_(AuditEvent.timestamp, AuditEvent.id) < after)
+
+    # One extra row tells us whether there is a next page
+    rows = (
+        q.order_by(AuditEvent.timestamp.desc(), AuditEvent.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    results = [
+        AuditEntryOut(
+            id=ev.id,
+            timestamp=ev.timestamp,
+            username=ev.username,
+            role=ev.role,
+            client=ClientOut.model_validate(client),
+            time_entry_id=ev.time_entry_id,
+            rewrite_id=ev.rewrite_id,
+            original=original,
+            standard=standard,
+            client_compliant=client_compliant,
+            audit_safe=audit_safe,
+            notes=notes or "",
+            tier=tier,
+            model_name=ev.model_name,
+            llm_backend=ev.llm_backend,
+            prompt_tokens=ev.prompt_tokens,
+            completion_tokens=ev.completion_tokens,
+            llm_duration_ms=ev.llm_duration_ms,
+            is_fallback=ev.is_fallback,
+        )
+        for ev, original, standard, client_compliant, audit_safe, notes, tier, client in rows
+    ]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return results, next_cursor
+
+
 @router.get("/audit-events", response_model=List[AuditEntryOut])
 def audit_events(
+    response: Response,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    client_id: Optional[str] = None,
+    username: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     db: Session = Depends(get_db),
     admin=Depends(require_admin),
 ):
-    events = (
-        db.query(AuditEvent)
-        .order_by(AuditEvent.timestamp.desc())
-        .limit(limit)
-        .all()
-    )
-
-    results: list[AuditEntryOut] = []
-    for ev in events:
-        te = db.query(TimeEntry).filter(TimeEntry.id == ev.time_entry_id).first()
-        rw = db.query(RewriteRecord).filter(RewriteRecord.id == ev.rewrite_id).first()
-        client = db.query(Client).filter(Client.id == ev.client_id).first()
-        if not te or not rw or not client:
-            continue
-
-        results.append(
-            AuditEntryOut(
-                id=ev.id,
-                timestamp=ev.timestamp,
-                username=ev.username,
-                role=ev.role,
-                client=ClientOut.model_validate(client),
-                time_entry_id=te.id,
-                rewrite_id=rw.id,
-                original=te.original,
-                standard=rw.standard,
-                client_compliant=rw.client_compliant,
-                audit_safe=rw.audit_safe,
-                notes=rw.notes or "",
-            )
+    """
+    Newest first. Filters: client_id, username and a [since, until)
+    timestamp range. Pass the X-Next-Cursor response header back as
+    `cursor` to get the next page; it is absent on the last page.
+    As before pagination, `limit` <= 0 means the default of 50; larger
+    values are clamped to AUDIT_EVENTS_MAX_LIMIT rather than rejected.
+    """
+    if limit <= 0:
+        limit = 50
+    limit = min(limit, AUDIT_EVENTS_MAX_LIMIT)
+    # Events acknowledged to callers may still be queued in the writer
+    audit_writer.flush()
+    try:
+        results, next_cursor = query_audit_events(
+            db,
+            limit=limit,
+            cursor=cursor,
+            client_id=client_id,
+            username=username,
+            since=since,
+            until=until,
         )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return results
+
+
+@router.get("/usage", response_model=UsageReport)
+def usage(
+    date_range: tuple[date, date] = Depends(report_range),
+    group_by: str = Query("day", pattern="^(day|client|model|user)$"),
+    client_id: Optional[str] = None,
+    model_name: Optional[str] = None,
+    username: Optional[str] = None,
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """
+    Rewrite volume, fallback rate, token usage and p50/p95 LLM latency per
+    day, client, model or user, from the daily rollup tables. Days are UTC
+    and inclusive; the default range is the last 30 days.
+    """
+    since, until = date_range
+    return usage_report(
+        db, since, until, group_by=group_by, client_id=client_id, model_name=model_name, username=username
+    )
+
+
+# =========================
+# Billing stats
+# =========================
+
+
+@router.get("/stats/billing", response_model=BillingReport)
+def billing_stats(
+    date_range: tuple[date, date] = Depends(report_range),
+    period: str = Query("day", pattern="^(day|week)$"),
+    client_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """
+    Entries, hours billed and fallback rate per client and day or week,
+    from the billing summary tables (app/billing.py). Days are UTC and
+    inclusive; weeks start on Monday. The default range is the last 30 days.
+    """
+    since, until = date_range
+    return billing_report(db, since, until, period=period, client_id=client_id)
+
+
+@router.get("/stats/clients", response_model=BillingReport)
+def client_billing_totals(
+    date_range: tuple[date, date] = Depends(report_range),
+    client_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """
+    The same figures as /stats/billing, one total per client for the range.
+    """
+    since, until = date_range
+    return billing_report(db, since, until, period="total", client_id=client_id)
@@ -4,31 +4,33 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from ..auth import create_access_token, verify_password
+from ..auth import create_access_token, password_hasher
 from ..config import settings
-from ..db import SessionLocal
+from ..db import run_in_db
+from ..deps import get_db
 from ..models import User
 from ..schemas import Token
 
 router = APIRouter()
 
 
-def get_db():
-    """Provide a DB session for this router."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 class LoginPayload(BaseModel):
     username: str
     password: str
 
 
+def _active_user(db: Session, username: str):
+    return db.query(User).filter(User.username == username, User.is_active == True).first()
+
+
+def _store_hash(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    db.commit()
+    db.refresh(user)
+
+
 @router.post("/login", response_model=Token)
-def login(payload: LoginPayload, db: Session = Depends(get_db)):
+async def login(payload: LoginPayload, db: Session = Depends(get_db)):
     """
     Login endpoint used by the SPA.
 
@@ -43,16 +45,20 @@ def login(payload: LoginPayload, db: Session = Depends(get_db)):
           "role": "user" | "admin"
         }
     """
-    user = (
-        db.query(User)
-        .filter(User.username == payload.username, User.is_active == True)
-        .first()
-    )
-    if not user or not verify_password(payload.password, user.password_hash):
+    user = await run_in_db(_active_user, db, payload.username)
+    verified, new_hash = False, None
+    if user:
+        # bcrypt runs on the password hashing pool (503 when it is saturated)
+        verified, new_hash = await password_hasher.verify_and_update(payload.password, user.password_hash)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
         )
+    if new_hash is not None:
+        # Stored with an outdated work factor: upgrade it now that we know
+        # the password
+        await run_in_db(_store_hash, db, user, new_hash)
 
     access_token = create_access_token(
         data={"sub": user.username, "role": user.role},
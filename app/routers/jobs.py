@@ -0,0 +1,176 @@
+import asyncio
+from tempfile import SpooledTemporaryFile
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import run_in_db
+from ..deps import get_current_user, get_db
+from ..ids import new_id
+from ..jobs import PARSERS, job_pool
+from ..models import Job, JobItem
+from ..schemas import JobOut, JobItemOut
+
+router = APIRouter()
+
+# Request body bytes buffered before each write to the spool file
+UPLOAD_WRITE_SIZE = 1024 * 1024
+
+
+def _job_out(job: Job) -> JobOut:
+    out = JobOut.model_validate(job)
+    out.pending_items = max(0, job.total_items - job.done_items - job.failed_items)
+    if job.total_items:
+        out.progress = (job.done_items + job.failed_items) / job.total_items
+    elif job.status == "completed":
+        out.progress = 1.0
+    return out
+
+
+def _get_job_for_user(db: Session, job_id: str, current_user) -> Job:
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job or (current_user.role != "admin" and job.username != current_user.username):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/import", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def import_file(
+    request: Request,
+    format: str = "csv",
+    client_id: Optional[str] = None,
+    filename: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Upload a CSV or LEDES 1998B export as the raw request body.
+
+    The body is spooled to a temp file (never held in memory as a whole),
+    parsed in the background and enqueued as job_items; the worker pool then
+    rewrites and saves each item. `client_id` is the default for rows that
+    do not carry their own. Poll GET /jobs/{id} for progress. Bodies over
+    settings.job_max_upload_bytes get 413.
+    """
+    fmt = format.lower()
+    if fmt not in PARSERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format {format!r}; expected one of {sorted(PARSERS)}",
+        )
+
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds {settings.job_max_upload_bytes} bytes",
+    )
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > settings.job_max_upload_bytes:
+        raise too_large
+
+    # The spool file rolls over to disk, so its writes run off the event loop
+    upload = SpooledTemporaryFile(max_size=1024 * 1024)
+    size = 0
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.job_max_upload_bytes:
+                raise too_large
+            buffer += chunk
+            if len(buffer) >= UPLOAD_WRITE_SIZE:
+                await asyncio.to_thread(upload.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await asyncio.to_thread(upload.write, bytes(buffer))
+        if size == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload")
+    except BaseException:
+        await asyncio.to_thread(upload.close)
+        raise
+
+    job = Job(
+        id=new_id("JOB"),
+        username=current_user.username,
+        role=current_user.role,
+        filename=filename,
+        format=fmt,
+        status="parsing",
+    )
+
+    def save() -> JobOut:
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return _job_out(job)
+
+    out = await run_in_db(save)
+    job_pool.submit_upload(job.id, upload, fmt, client_id)
+    return out
+
+
+@router.get("/", response_model=List[JobOut])
+def list_jobs(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    query = db.query(Job)
+    if current_user.role != "admin":
+        query = query.filter(Job.username == current_user.username)
+    jobs = query.order_by(Job.created_at.desc()).limit(limit).all()
+    return [_job_out(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return _job_out(_get_job_for_user(db, job_id, current_user))
+
+
+@router.get("/{job_id}/progress")
+def job_progress(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Per-status item counts, straight from job_items.
+    """
+    job = _get_job_for_user(db, job_id, current_user)
+    counts = dict(
+        db.query(JobItem.status, func.count(JobItem.id))
+        .filter(JobItem.job_id == job.id)
+        .group_by(JobItem.status)
+        .all()
+    )
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total_items,
+        "pending": counts.get("pending", 0),
+        "running": counts.get("running", 0),
+        "done": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+    }
+
+
+@router.get("/{job_id}/items", response_model=List[JobItemOut])
+def job_items(
+    job_id: str,
+    item_status: Optional[str] = Query(None, alias="status"),
+    after_seq: int = -1,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    job = _get_job_for_user(db, job_id, current_user)
+    query = db.query(JobItem).filter(JobItem.job_id == job.id, JobItem.seq > after_seq)
+    if item_status:
+        query = query.filter(JobItem.status == item_status)
+    return query.order_by(JobItem.seq).limit(min(limit, 1000)).all()
@@ -1,40 +1,44 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+import asyncio
 import json
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 
-from ..db import SessionLocal
-from ..deps import get_current_user
-from ..llm import call_ollama
+from ..db import SessionLocal, run_in_db
+from ..deps import get_current_user, get_db
+from ..audit import AuditWriter, audit_writer
+from ..cache import cached_rewrite, cached_rewrite_stream
+from ..scheduler import PRIORITY_BULK, QueueFullError, llm_scheduler
+from ..entries import build_saved_rows
+from ..llm import TIER_LLM
 from ..models import (
-    Client,
     TimeEntry,
     RewriteRecord,
-    AuditEvent,
-    DEMO_RULES_BY_CLIENT_ID,
+    Client,
 )
+from ..billing import record_billing
+from ..usage import record_usage
+from ..pagination import InvalidCursor, decode_cursor, encode_cursor
+from ..profiles import ClientProfile, client_profiles
 from ..schemas import (
+    ClientOut,
     RewriteRequest,
     RewriteResponse,
     RewriteAndSaveRequest,
     SavedRewriteResponse,
+    BatchRewriteItem,
+    BatchRewriteRequest,
+    BatchRewriteResult,
 )
 from ..config import settings
 
 router = APIRouter()
 
 
-def get_db():
-    """FastAPI dependency to provide a DB session."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/rewrite", response_model=RewriteResponse)
 async def rewrite(
     payload: RewriteRequest,
@@ -50,14 +54,64 @@ async def rewrite(
             detail="Original narrative cannot be empty.",
         )
 
-    rewrite = await call_ollama(
+    rewrite = await cached_rewrite(
         original=payload.original,
         hours=payload.hours,
         rules=payload.rules,
+        user=current_user.username,
     )
     return rewrite
 
 
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post("/rewrite/stream")
+async def rewrite_stream(
+    payload: RewriteRequest,
+    current_user=Depends(get_current_user),
+):
+    """
+    Server-sent-events version of /rewrite.
+
+    Emits one `field` event ({"field": ..., "value": ...}) per output field
+    as soon as the model finishes it, then a single `result` event with the
+    validated RewriteResponse. The result event wins: when the drift check or
+    parsing falls back, it replaces whatever fields were streamed.
+    """
+    if not payload.original or not payload.original.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Original narrative cannot be empty.",
+        )
+
+    # Answer 429 up front rather than after the event stream has started
+    llm_scheduler.ensure_capacity()
+
+    async def events():
+        try:
+            async for kind, value in cached_rewrite_stream(
+                original=payload.original,
+                hours=payload.hours,
+                rules=payload.rules,
+                user=current_user.username,
+            ):
+                if kind == "field":
+                    name, text = value
+                    yield _sse("field", json.dumps({"field": name, "value": text}))
+                else:
+                    yield _sse("result", value.model_dump_json())
+        except QueueFullError as e:
+            yield _sse("error", json.dumps({"detail": str(e), "retry_after": e.retry_after}))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/rewrite-and-save", response_model=SavedRewriteResponse)
 async def rewrite_and_save(
     payload: RewriteAndSaveRequest,
@@ -78,123 +132,335 @@ async def rewrite_and_save(
             detail="Original narrative cannot be empty.",
         )
 
-    client = db.query(Client).filter(Client.id == payload.client_id).first()
-    if not client:
+    # Demo rules enriched with admin-provided guidelines and examples,
+    # compiled once per client (see app/profiles.py)
+    profile = await client_profiles.aget(db, payload.client_id)
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Client not found",
         )
 
-    # Base rules from demo config
-    base_rules = DEMO_RULES_BY_CLIENT_ID.get(payload.client_id, {}).copy()
-
-    # Enrich rules with admin-provided guidelines and examples if present
-    if client.billing_guidelines:
-        base_rules["billing_guidelines"] = client.billing_guidelines
-    if client.accepted_examples:
-        base_rules["accepted_examples"] = client.accepted_examples
-    if client.denied_examples:
-        base_rules["denied_examples"] = client.denied_examples
-
-    rewrite = await call_ollama(
+    examples = profile.select_examples(payload.original)
+    rewrite = await cached_rewrite(
         original=payload.original,
         hours=payload.hours,
-        rules=base_rules,
+        profile=profile,
+        examples=examples,
+        user=current_user.username,
     )
 
-    now_ts = int(datetime.utcnow().timestamp() * 1000)
-    time_entry_id = f"TE-{now_ts}"
-    rewrite_id = f"RW-{now_ts}"
-    audit_id = f"AE-{now_ts}"
-
-    # TimeEntry
-    te = TimeEntry(
-        id=time_entry_id,
-        client_id=client.id,
-        original=payload.original,
-        hours=payload.hours,
-    )
-    db.add(te)
-    db.commit()
-    db.refresh(te)
-
-    # RewriteRecord
-    rw = RewriteRecord(
-        id=rewrite_id,
-        time_entry_id=time_entry_id,
-        standard=rewrite.standard,
-        client_compliant=rewrite.client_compliant,
-        audit_safe=rewrite.audit_safe,
-        notes=rewrite.notes,
-    )
-    db.add(rw)
-    db.commit()
-    db.refresh(rw)
-
-    # AuditEvent
-    ae = AuditEvent(
-        id=audit_id,
-        timestamp=datetime.utcnow(),
-        username=current_user.username,
-        role=current_user.role,
-        client_id=client.id,
-        time_entry_id=time_entry_id,
-        rewrite_id=rewrite_id,
-        model_name=settings.model_name,
-        rules_snapshot=json.dumps(base_rules),
+    time_entry_id, rewrite_id = await run_in_db(
+        _save_rewrite, db, profile, payload, rewrite, current_user.username, current_user.role
     )
-    db.add(ae)
-    db.commit()
 
     return SavedRewriteResponse(
         time_entry_id=time_entry_id,
         rewrite_id=rewrite_id,
-        client=client,
+        client=profile.client,
         rewrite=rewrite,
+        prompt_tokens_saved=examples.tokens_saved,
     )
 
 
+def _save_rewrite(
+    db: Session,
+    profile: ClientProfile,
+    payload: RewriteAndSaveRequest,
+    rewrite: RewriteResponse,
+    username: str,
+    role: str,
+    writer: AuditWriter = audit_writer,
+) -> tuple[str, str]:
+    """
+    Persist a rewrite-and-save result atomically; runs on the DB thread pool.
+    """
+    now = datetime.utcnow()
+    rows, event, (time_entry_id, rewrite_id) = build_saved_rows(
+        profile, payload.original, payload.hours, rewrite, username, role, now
+    )
+
+    # One transaction (one fsync) for the entry, its rewrite, the usage
+    # rollups and the billing summaries; the audit event is group-committed
+    # behind it (app/audit.py)
+    db.add_all(rows)
+    record_usage(db, [(now, profile.client_id, username, rewrite)])
+    record_billing(db, [(now, profile.client_id, payload.hours, rewrite)])
+    try:
+        writer.commit_with_events(db, [event])
+    except Exception:
+        db.rollback()
+        raise
+    return time_entry_id, rewrite_id
+
+
+def _parse_batch_items(body: bytes, content_type: str) -> list:
+    """
+    Accept either JSON ({"items": [...]} or a bare list) or NDJSON (one item
+    per line). Returns a list whose elements are a BatchRewriteItem or an
+    error string, so one bad line does not reject the whole batch.
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        raw_items = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw_items.append(json.loads(line))
+            except ValueError as e:
+                raw_items.append(f"Invalid JSON line: {e}")
+    else:
+        try:
+            data = json.loads(body or b"null")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON")
+        if isinstance(data, list):
+            raw_items = data
+        else:
+            try:
+                raw_items = BatchRewriteRequest.model_validate(data).items
+            except Exception:
+                raise HTTPException(
+                    status_code=400,
+                    detail='Expected {"items": [...]}, a JSON list or an NDJSON body',
+                )
+
+    items: list = []
+    for raw in raw_items:
+        if isinstance(raw, str):
+            items.append(raw)
+            continue
+        try:
+            item = BatchRewriteItem.model_validate(raw)
+        except Exception as e:
+            items.append(f"Invalid item: {e}")
+            continue
+        if not item.original.strip():
+            items.append("Original narrative cannot be empty.")
+            continue
+        items.append(item)
+    return items
+
+
+@router.post("/batch")
+async def rewrite_batch(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Rewrite and save many entries in one call.
+
+    Items run through the rewrite pipeline with at most
+    settings.batch_concurrency in flight. Results stream back as NDJSON
+    (one BatchRewriteResult per line, in completion order) followed by a
+    summary line. Rows are persisted with bulk inserts of up to
+    settings.batch_flush_size items (audit events through the group-commit
+    writer); a failed item is reported on its own line and never aborts
+    the batch.
+    """
+    items = _parse_batch_items(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.batch_max_items} items",
+        )
+
+    username, role = current_user.username, current_user.role
+
+    client_ids = {it.client_id for it in items if isinstance(it, BatchRewriteItem)}
+    profiles = {}
+    for cid in client_ids:
+        profile = await client_profiles.aget(db, cid)
+        if profile is not None:
+            profiles[cid] = profile
+    semaphore = asyncio.Semaphore(max(1, settings.batch_concurrency))
+
+    async def run_item(index: int, item):
+        if isinstance(item, str):
+            return BatchRewriteResult(index=index, status="error", error=item)
+        if item.client_id not in profiles:
+            return BatchRewriteResult(
+                index=index, ref=item.ref, status="error", error="Client not found"
+            )
+        try:
+            async with semaphore:
+                rewrite = await cached_rewrite(
+                    original=item.original,
+                    hours=item.hours,
+                    profile=profiles[item.client_id],
+                    user=username,
+                    priority=PRIORITY_BULK,
+                )
+        except Exception as e:
+            return BatchRewriteResult(index=index, ref=item.ref, status="error", error=str(e))
+        return index, item, rewrite
+
+    def persist(done: list) -> list[BatchRewriteResult]:
+        now = datetime.utcnow()
+        rows = []
+        events = []
+        results = []
+        for index, item, rewrite in done:
+            item_rows, event, (time_entry_id, rewrite_id) = build_saved_rows(
+                profiles[item.client_id], item.original, item.hours, rewrite, username, role, now
+            )
+            rows.extend(item_rows)
+            events.append(event)
+            results.append(
+                BatchRewriteResult(
+                    index=index,
+                    ref=item.ref,
+                    status="ok",
+                    time_entry_id=time_entry_id,
+                    rewrite_id=rewrite_id,
+                    client=profiles[item.client_id].client,
+                    rewrite=rewrite,
+                )
+            )
+        # Own session: the response streams on after the request's session
+        # may already be gone
+        session = SessionLocal()
+        try:
+            session.add_all(rows)
+            record_usage(session, [(now, item.client_id, username, rewrite) for _, item, rewrite in done])
+            record_billing(session, [(now, item.client_id, item.hours, rewrite) for _, item, rewrite in done])
+            audit_writer.commit_with_events(session, events)
+        except Exception as e:
+            session.rollback()
+            return [
+                BatchRewriteResult(
+                    index=index, ref=item.ref, status="error", error=f"Save failed: {e}"
+                )
+                for index, item, _ in done
+            ]
+        finally:
+            session.close()
+        return results
+
+    async def lines():
+        loop = asyncio.get_running_loop()
+        pending = {asyncio.ensure_future(run_item(i, it)) for i, it in enumerate(items)}
+        buffered: list = []
+        deadline = 0.0
+        ok = failed = 0
+
+        try:
+            while pending or buffered:
+                finished = set()
+                if pending:
+                    timeout = max(0.0, deadline - loop.time()) if buffered else None
+                    finished, pending = await asyncio.wait(
+                        pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                    )
+
+                for task in finished:
+                    outcome = task.result()
+                    if isinstance(outcome, BatchRewriteResult):
+                        failed += 1
+                        yield outcome.model_dump_json(exclude_none=True) + "\n"
+                        continue
+                    if not buffered:
+                        deadline = loop.time() + settings.batch_flush_interval
+                    buffered.append(outcome)
+
+                if buffered and (
+                    not pending
+                    or len(buffered) >= settings.batch_flush_size
+                    or loop.time() >= deadline
+                ):
+                    for result in await run_in_db(persist, buffered):
+                        if result.status == "ok":
+                            ok += 1
+                        else:
+                            failed += 1
+                        yield result.model_dump_json(exclude_none=True) + "\n"
+                    buffered = []
+        finally:
+            for task in pending:
+                task.cancel()
+
+        yield json.dumps({"status": "done", "total": len(items), "ok": ok, "failed": failed}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+RECENT_MAX_LIMIT = 200
+
+
 @router.get("/recent", response_model=List[SavedRewriteResponse])
 def recent_time_entries(
+    response: Response,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    client_id: Optional[str] = None,
+    username: Optional[str] = None,
     db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
 ):
     """
-    Return the most recent saved time entries with their latest rewrite.
+    The caller's most recent saved time entries, each with its latest
+    rewrite and client, newest first. One query per page, driven by the
+    (username, created_at, id) index, so the cost does not grow with the
+    table.
+
+    Pass the X-Next-Cursor response header back as `cursor` for the next
+    page. Admins may look at another user's entries with `username`.
+    As before pagination, `limit` <= 0 means the default of 20; larger
+    values are clamped to RECENT_MAX_LIMIT rather than rejected.
     """
     if limit <= 0:
         limit = 20
+    limit = min(limit, RECENT_MAX_LIMIT)
+    owner = username or current_user.username
+    if owner != current_user.username and current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    try:
+        after = decode_cursor(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    entries = (
-        db.query(TimeEntry)
-        .order_by(TimeEntry.created_at.desc())
-        .limit(limit)
-        .all()
+    latest_rewrite_id = (
+        select(RewriteRecord.id)
+        .where(RewriteRecord.time_entry_id == TimeEntry.id)
+        .order_by(RewriteRecord.created_at.desc(), RewriteRecord.id.desc())
+        .limit(1)
+        .correlate(TimeEntry)
+        .scalar_subquery()
     )
+    q = (
+        db.query(TimeEntry, RewriteRecord, Client)
+        .join(RewriteRecord, RewriteRecord.id == latest_rewrite_id)
+        .join(Client, Client.id == TimeEntry.client_id)
+        .filter(TimeEntry.username == owner)
+    )
+    if client_id:
+        q = q.filter(TimeEntry.client_id == client_id)
+    if after:
+        q = q.filter(tuple_(TimeEntry.created_at, TimeEntry.id) < after)
 
-    results: List[SavedRewriteResponse] = []
-
-    for te in entries:
-        if not te.rewrites:
-            continue
+    rows = (
+        q.order_by(TimeEntry.created_at.desc(), TimeEntry.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
 
-        latest_rw = sorted(
-            te.rewrites, key=lambda r: r.created_at, reverse=True
-        )[0]
-        client = te.client
-
-        results.append(
-            SavedRewriteResponse(
-                time_entry_id=te.id,
-                rewrite_id=latest_rw.id,
-                client=client,
-                rewrite=RewriteResponse(
-                    standard=latest_rw.standard,
-                    client_compliant=latest_rw.client_compliant,
-                    audit_safe=latest_rw.audit_safe,
-                    notes=latest_rw.notes or "",
-                ),
-            )
+    return [
+        SavedRewriteResponse(
+            time_entry_id=te.id,
+            rewrite_id=rw.id,
+            client=ClientOut.model_validate(client),
+            rewrite=RewriteResponse(
+                standard=rw.standard,
+                client_compliant=rw.client_compliant,
+                audit_safe=rw.audit_safe,
+                notes=rw.notes or "",
+                tier=rw.tier or TIER_LLM,
+            ),
         )
-
-    return results
+        for te, rw, client in rows
+    ]
@@ -0,0 +1,199 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from .config import settings
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+
+class QueueFullError(Exception):
+    """
+    Raised instead of queueing when the LLM wait queue is at its maximum
+    depth. Routers turn it into 429 with Retry-After (see main.py).
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    Admission control in front of every Ollama generation.
+
+    - at most `max_concurrency` generations run at once
+    - waiting callers are grouped by priority lane; a lower lane is only
+      served when every higher lane is empty
+    - within a lane, users are served round-robin, so one user's burst
+      cannot starve everyone else
+    - interactive callers are rejected with QueueFullError once
+      `max_queue_depth` callers are already waiting; bulk callers (batch,
+      jobs) are bounded by their own concurrency settings and always queue
+
+    Single event loop only; all bookkeeping happens on that loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_depth: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max_queue_depth
+        self._active = 0
+        # priority -> user -> FIFO of waiting futures
+        self._lanes: dict[int, "OrderedDict[str, deque[asyncio.Future]]"] = {}
+        self._queued = 0
+
+        self._service_ewma = 1.0  # seconds a slot is typically held
+        self._recent_waits: deque[float] = deque(maxlen=1000)
+        self.granted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # ----------------- queue bookkeeping -----------------
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._service_ewma * (self._queued + 1) / self.max_concurrency))
+
+    def ensure_capacity(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """
+        Raise QueueFullError now if a caller at this priority would be
+        rejected. Lets streaming endpoints answer 429 before the response
+        starts.
+        """
+        if (
+            priority == PRIORITY_INTERACTIVE
+            and self._active >= self.max_concurrency
+            and self._queued >= self.max_queue_depth
+        ):
+            self.rejected += 1
+            raise QueueFullError(self._retry_after())
+
+    def _enqueue(self, user: str, priority: int) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        lane = self._lanes.setdefault(priority, OrderedDict())
+        lane.setdefault(user, deque()).append(fut)
+        self._queued += 1
+        return fut
+
+    def _discard(self, fut: asyncio.Future, user: str, priority: int) -> None:
+        lane = self._lanes.get(priority)
+        if not lane or user not in lane:
+            return
+        try:
+            lane[user].remove(fut)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not lane[user]:
+            del lane[user]
+
+    def _dispatch(self) -> None:
+        while self._active < self.max_concurrency and self._queued:
+            for priority in sorted(self._lanes):
+                lane = self._lanes[priority]
+                if lane:
+                    break
+            else:
+                return
+
+            # Round-robin: take the head of the first user's queue, then
+            # move that user to the back of the lane.
+            user, waiters = next(iter(lane.items()))
+            fut = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                lane.move_to_end(user)
+            else:
+                del lane[user]
+
+            if fut.cancelled():
+                continue
+            self._active += 1
+            fut.set_result(None)
+
+    # ----------------- public API -----------------
+
+    async def acquire(self, user: str, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """
+        Wait for a generation slot. Returns the seconds spent queued.
+        """
+        start = time.perf_counter()
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+        else:
+            self.ensure_capacity(priority)
+            fut = self._enqueue(user, priority)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # Granted just as we were cancelled: hand the slot on
+                    self.release()
+                else:
+                    self._discard(fut, user, priority)
+                raise
+
+        waited = time.perf_counter() - start
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._recent_waits.append(waited)
+        return waited
+
+    def release(self, held: Optional[float] = None) -> None:
+        if held is not None:
+            self._service_ewma = 0.8 * self._service_ewma + 0.2 * held
+        self._active = max(0, self._active - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[float]:
+        waited = await self.acquire(user, priority)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+
+        def pct(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "active": self._active,
+            "queued": self._queued,
+            "queued_by_priority": {
+                PRIORITY_NAMES.get(p, str(p)): sum(len(q) for q in lane.values())
+                for p, lane in self._lanes.items()
+            },
+            "queued_by_user": {
+                user: sum(len(lane.get(user, ())) for lane in self._lanes.values())
+                for user in {u for lane in self._lanes.values() for u in lane}
+            },
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": (self.total_wait / self.granted) if self.granted else 0.0,
+            "p50_wait_seconds": pct(0.50),
+            "p95_wait_seconds": pct(0.95),
+            "max_wait_seconds": self.max_wait,
+            "avg_service_seconds": self._service_ewma,
+        }
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.llm_max_concurrency,
+    max_queue_depth=settings.llm_max_queue_depth,
+)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # --------- Auth / Users ---------
@@ -16,6 +16,7 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: str
     role: str
+    exp: Optional[int] = None
 
 
 class UserBase(BaseModel):
@@ -29,6 +30,11 @@ class UserCreate(BaseModel):
     role: str = "user"
 
 
+class UserUpdate(BaseModel):
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
 class UserOut(UserBase):
     id: int
     is_active: bool
@@ -81,11 +87,28 @@ class RewriteRequest(BaseModel):
     rules: Optional[dict] = None
 
 
+class RewriteTelemetry(BaseModel):
+    """
+    What one model call cost. Attached by app/llm.py to the rewrite it
+    produced; cache hits and rules-tier answers carry none.
+    """
+
+    model_name: str
+    backend: Optional[str] = None  # base URL of the Ollama server that answered
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    duration_ms: int = 0  # request to Ollama until its full answer
+
+
 class RewriteResponse(BaseModel):
     standard: str
     client_compliant: str
     audit_safe: str
     notes: str
+    # "rules" (app/fastpath.py) | "llm" | "fallback"
+    tier: str = "llm"
+    # Persisted with the rewrite (app/usage.py), never sent to clients
+    telemetry: Optional[RewriteTelemetry] = Field(default=None, exclude=True)
 
 
 class RewriteAndSaveRequest(BaseModel):
@@ -99,6 +122,68 @@ class SavedRewriteResponse(BaseModel):
     rewrite_id: str
     client: ClientOut
     rewrite: RewriteResponse
+    # Estimated prompt tokens avoided by sending only the relevant examples
+    prompt_tokens_saved: Optional[int] = None
+
+
+class BatchRewriteItem(BaseModel):
+    client_id: str
+    original: str
+    hours: float
+    ref: Optional[str] = None  # caller's own identifier, echoed back
+
+
+class BatchRewriteRequest(BaseModel):
+    items: List[BatchRewriteItem]
+
+
+class BatchRewriteResult(BaseModel):
+    """
+    One NDJSON line of /rewrites/batch output.
+    """
+
+    index: int
+    ref: Optional[str] = None
+    status: str  # "ok" | "error"
+    error: Optional[str] = None
+    time_entry_id: Optional[str] = None
+    rewrite_id: Optional[str] = None
+    client: Optional[ClientOut] = None
+    rewrite: Optional[RewriteResponse] = None
+
+
+class JobOut(BaseModel):
+    id: str
+    username: str
+    filename: Optional[str] = None
+    format: str
+    status: str
+    total_items: int
+    done_items: int
+    failed_items: int
+    pending_items: int = 0
+    progress: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobItemOut(BaseModel):
+    id: int
+    seq: int
+    client_id: Optional[str] = None
+    original: str
+    hours: float
+    status: str
+    error: Optional[str] = None
+    time_entry_id: Optional[str] = None
+    rewrite_id: Optional[str] = None
+
+    class Config:
+        from_attributes = True
 
 
 class AuditEntryOut(BaseModel):
@@ -114,3 +199,57 @@ class AuditEntryOut(BaseModel):
     client_compliant: str
     audit_safe: str
     notes: str
+    tier: Optional[str] = None
+    model_name: Optional[str] = None
+    llm_backend: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    llm_duration_ms: Optional[int] = None
+    is_fallback: Optional[bool] = None
+
+
+# --------- Usage rollups (GET /admin/usage) ---------
+
+
+class UsageRow(BaseModel):
+    key: str  # the day, client id, model or username, per group_by
+    rewrites: int
+    llm_calls: int  # rewrites that cost a model call (not rules tier or cache)
+    fallbacks: int
+    fallback_rate: float
+    prompt_tokens: int
+    completion_tokens: int
+    avg_prompt_tokens: float
+    avg_completion_tokens: float
+    tokens_per_second: Optional[float] = None  # completion tokens over LLM time
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+
+
+class UsageReport(BaseModel):
+    group_by: str
+    since: str
+    until: str
+    rows: List[UsageRow]
+
+
+# --------- Billing summaries (GET /admin/stats/...) ---------
+
+
+class BillingRow(BaseModel):
+    period_start: Optional[str] = None  # the day, or the Monday of the week; None for range totals
+    client_id: str
+    client_name: Optional[str] = None
+    entries: int
+    hours: float
+    fallbacks: int
+    fallback_rate: float
+    rules_entries: int
+    llm_entries: int
+
+
+class BillingReport(BaseModel):
+    period: str  # "day", "week" or "total"
+    since: str
+    until: str
+    rows: List[BillingRow]
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller (leader)
+    starts the work as a task, later callers (followers) await the same task.
+
+    - the result, or the exception, is delivered to every waiter
+    - cancelling one waiter never cancels the shared work while anyone else
+      is still waiting; when the last waiter goes away the work is cancelled
+    - the key is released as soon as the work finishes, so a later call
+      starts fresh (caching results is the rewrite cache's job, not ours)
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, k=key, c=call: self._forget(k, c))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                # Last one waiting: nobody wants the result any more
+                call.task.cancel()
+                self._forget(key, call)
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.followers,
+        }
@@ -0,0 +1,265 @@
+import bisect
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .llm import TIER_FALLBACK
+from .models import AuditEvent, RewriteRecord, TimeEntry, UsageDaily, UsageDailyLatency
+from .schemas import RewriteResponse, UsageReport, UsageRow
+
+# Upper bounds of the latency buckets kept per rollup row; OVERFLOW_MS is +Inf
+LATENCY_BOUNDS_MS = (250, 500, 1000, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000, 120000)
+OVERFLOW_MS = 2**31 - 1
+
+_KEYS = ("day", "client_id", "model_name", "username")
+_SUMS = ("rewrites", "llm_calls", "fallbacks", "prompt_tokens", "completion_tokens", "llm_duration_ms")
+
+GROUP_BY = {
+    "day": "day",
+    "client": "client_id",
+    "model": "model_name",
+    "user": "username",
+}
+
+
+# ----------------- Per-rewrite telemetry -----------------
+
+
+def telemetry_columns(rewrite: RewriteResponse) -> dict:
+    """
+    RewriteRecord / AuditEvent column values for one rewrite. Token and
+    latency columns stay NULL when no model call was made (rules tier,
+    cache hit, network fallback).
+    """
+    t = rewrite.telemetry
+    return {
+        "llm_backend": t.backend if t else None,
+        "prompt_tokens": t.prompt_tokens if t else None,
+        "completion_tokens": t.completion_tokens if t else None,
+        "llm_duration_ms": t.duration_ms if t else None,
+        "is_fallback": rewrite.tier == TIER_FALLBACK,
+    }
+
+
+def latency_bucket(duration_ms: int) -> int:
+    i = bisect.bisect_left(LATENCY_BOUNDS_MS, duration_ms)
+    return LATENCY_BOUNDS_MS[i] if i < len(LATENCY_BOUNDS_MS) else OVERFLOW_MS
+
+
+# ----------------- Rollup maintenance -----------------
+
+
+class UsageAccumulator:
+    """
+    Sums saved rewrites per (day, client, model, user) so any number of
+    them becomes one upsert per rollup row.
+    """
+
+    def __init__(self):
+        self.totals: dict[tuple, list[int]] = defaultdict(lambda: [0] * len(_SUMS))
+        self.latency: dict[tuple, int] = defaultdict(int)
+
+    def add(
+        self,
+        created_at: datetime,
+        client_id: str,
+        model_name: Optional[str],
+        username: Optional[str],
+        is_fallback: bool,
+        prompt_tokens: Optional[int],
+        completion_tokens: Optional[int],
+        duration_ms: Optional[int],
+    ) -> None:
+        key = (created_at.strftime("%Y-%m-%d"), client_id, model_name or settings.model_name, username or "")
+        sums = self.totals[key]
+        sums[0] += 1
+        sums[2] += 1 if is_fallback else 0
+        if duration_ms is not None:
+            sums[1] += 1
+            sums[3] += prompt_tokens or 0
+            sums[4] += completion_tokens or 0
+            sums[5] += duration_ms
+            self.latency[key + (latency_bucket(duration_ms),)] += 1
+
+    def add_rewrite(self, created_at: datetime, client_id: str, username: str, rewrite: RewriteResponse) -> None:
+        cols = telemetry_columns(rewrite)
+        model_name = rewrite.telemetry.model_name if rewrite.telemetry else settings.model_name
+        self.add(
+            created_at, client_id, model_name, username, cols["is_fallback"],
+            cols["prompt_tokens"], cols["completion_tokens"], cols["llm_duration_ms"],
+        )
+
+    def flush(self, db: Session) -> None:
+        """
+        Upsert the sums into the rollup tables inside `db`'s transaction.
+        """
+        if self.totals:
+            stmt = insert(UsageDaily).values(
+                [dict(zip(_KEYS + _SUMS, key + tuple(sums))) for key, sums in self.totals.items()]
+            )
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=list(_KEYS),
+                    set_={c: getattr(UsageDaily, c) + stmt.excluded[c] for c in _SUMS},
+                )
+            )
+        if self.latency:
+            stmt = insert(UsageDailyLatency).values(
+                [dict(zip(_KEYS + ("le_ms", "calls"), key + (n,))) for key, n in self.latency.items()]
+            )
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=list(_KEYS) + ["le_ms"],
+                    set_={"calls": UsageDailyLatency.calls + stmt.excluded.calls},
+                )
+            )
+        self.totals.clear()
+        self.latency.clear()
+
+
+def record_usage(db: Session, saved: Iterable[tuple[datetime, str, str, RewriteResponse]]) -> None:
+    """
+    Add saved rewrites, as (created_at, client_id, username, rewrite), to
+    the daily rollups. Call before committing the rows themselves so both
+    land in the same transaction.
+    """
+    acc = UsageAccumulator()
+    for created_at, client_id, username, rewrite in saved:
+        acc.add_rewrite(created_at, client_id, username, rewrite)
+    acc.flush(db)
+
+
+def rebuild_usage_rollups(bind, chunk: int = 5000) -> int:
+    """
+    Recompute both rollup tables from the rewrites table (first start after
+    the upgrade, or to repair them). Returns the number of rewrites read.
+    """
+    db = Session(bind=bind)
+    try:
+        db.execute(delete(UsageDaily))
+        db.execute(delete(UsageDailyLatency))
+        q = (
+            select(
+                RewriteRecord.created_at,
+                TimeEntry.client_id,
+                AuditEvent.model_name,
+                TimeEntry.username,
+                RewriteRecord.tier,
+                RewriteRecord.is_fallback,
+                RewriteRecord.prompt_tokens,
+                RewriteRecord.completion_tokens,
+                RewriteRecord.llm_duration_ms,
+            )
+            .join(TimeEntry, TimeEntry.id == RewriteRecord.time_entry_id)
+            .outerjoin(AuditEvent, AuditEvent.rewrite_id == RewriteRecord.id)
+            .execution_options(yield_per=chunk)
+        )
+        acc = UsageAccumulator()
+        count = 0
+        for created_at, client_id, model_name, username, tier, fallback, pt, ct, ms in db.execute(q):
+            if fallback is None:
+                fallback = tier == TIER_FALLBACK
+            acc.add(created_at or datetime.utcnow(), client_id, model_name, username, fallback, pt, ct, ms)
+            count += 1
+        acc.flush(db)
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+# ----------------- Reporting -----------------
+
+
+def bucket_percentile(buckets: list[tuple[int, int]], q: float) -> Optional[float]:
+    """
+    Estimate a percentile from (le_ms, calls) pairs sorted by le_ms,
+    interpolating linearly inside the bucket it falls in (like Prometheus'
+    histogram_quantile). The overflow bucket reports its lower bound.
+    """
+    total = sum(n for _, n in buckets)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    lower = 0
+    for le, n in buckets:
+        if n and seen + n >= rank:
+            if le == OVERFLOW_MS:
+                return float(lower)
+            return lower + (le - lower) * (rank - seen) / n
+        seen += n
+        lower = le
+    return float(lower)
+
+
+def usage_report(
+    db: Session,
+    since: date,
+    until: date,
+    group_by: str = "day",
+    client_id: Optional[str] = None,
+    model_name: Optional[str] = None,
+    username: Optional[str] = None,
+) -> UsageReport:
+    """
+    Totals, fallback rate, token usage and p50/p95 LLM latency between
+    `since` and `until` (inclusive days), grouped by day, client, model or
+    user. Reads only the rollup tables.
+    """
+
+    def scoped(q, table):
+        q = q.where(table.day >= since.isoformat(), table.day <= until.isoformat())
+        if client_id:
+            q = q.where(table.client_id == client_id)
+        if model_name:
+            q = q.where(table.model_name == model_name)
+        if username:
+            q = q.where(table.username == username)
+        return q
+
+    col = GROUP_BY[group_by]
+    key = getattr(UsageDaily, col)
+    totals = db.execute(
+        scoped(
+            select(key, *(func.sum(getattr(UsageDaily, c)) for c in _SUMS)).group_by(key).order_by(key),
+            UsageDaily,
+        )
+    ).all()
+
+    lkey = getattr(UsageDailyLatency, col)
+    buckets: dict[str, list[tuple[int, int]]] = defaultdict(list)
+    for k, le, n in db.execute(
+        scoped(
+            select(lkey, UsageDailyLatency.le_ms, func.sum(UsageDailyLatency.calls))
+            .group_by(lkey, UsageDailyLatency.le_ms)
+            .order_by(lkey, UsageDailyLatency.le_ms),
+            UsageDailyLatency,
+        )
+    ):
+        buckets[k].append((le, n))
+
+    rows = []
+    for k, rewrites, llm_calls, fallbacks, prompt_tokens, completion_tokens, duration_ms in totals:
+        rows.append(
+            UsageRow(
+                key=k,
+                rewrites=rewrites,
+                llm_calls=llm_calls,
+                fallbacks=fallbacks,
+                fallback_rate=fallbacks / rewrites if rewrites else 0.0,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                avg_prompt_tokens=prompt_tokens / llm_calls if llm_calls else 0.0,
+                avg_completion_tokens=completion_tokens / llm_calls if llm_calls else 0.0,
+                tokens_per_second=completion_tokens / (duration_ms / 1000) if duration_ms else None,
+                p50_ms=bucket_percentile(buckets.get(k, []), 0.50),
+                p95_ms=bucket_percentile(buckets.get(k, []), 0.95),
+            )
+        )
+    return UsageReport(group_by=group_by, since=since.isoformat(), until=until.isoformat(), rows=rows)
@@ -0,0 +1,186 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from .schemas import RewriteResponse
+
+# ----------------- Drift config (tuned to be more forgiving) -----------------
+
+STOPWORDS = frozenset({
+    "the", "a", "an", "and", "or", "but", "of", "to", "in", "on", "for", "with",
+    "by", "at", "from", "as", "is", "are", "was", "were", "be", "been", "being",
+    "this", "that", "these", "those", "it", "its", "into", "about",
+    "regarding", "related", "re", "re:"
+})
+
+# Tokens we REALLY do not want silently dropped (crude safety guard)
+MUST_PRESERVE_TOKENS = frozenset({"farts", "butt", "toilet", "poop", "nsfw"})
+
+# How much overlap between original and rewritten content we require
+# 0.30 = VERY forgiving (only huge semantic changes will trip it)
+DRIFT_MIN_OVERLAP = 0.30
+
+VARIANTS = ("standard", "client_compliant", "audit_safe")
+
+_WORD = re.compile(r"\b\w+\b")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?!\w)")
+
+
+# ----------------- Text facts (computed once per text) -----------------
+
+
+def _canonical_number(raw: str) -> str:
+    return repr(float(raw))
+
+
+@dataclass(frozen=True)
+class TextFacts:
+    text: str
+    terms: frozenset  # lowercase words minus STOPWORDS
+    numbers: frozenset  # canonical numeric literals
+
+
+def analyze(text: str) -> TextFacts:
+    """
+    Single regex pass per text; every check reads from the result.
+    """
+    lowered = text.lower()
+    return TextFacts(
+        text=text,
+        terms=frozenset(w for w in _WORD.findall(lowered) if w not in STOPWORDS),
+        numbers=frozenset(_canonical_number(n) for n in _NUMBER.findall(text)),
+    )
+
+
+@dataclass
+class ValidationContext:
+    hours: Optional[float] = None
+    forbidden: Optional[re.Pattern] = None  # ClientProfile.forbidden
+
+
+@dataclass(frozen=True)
+class Issue:
+    check: str
+    variant: str
+    detail: str
+    reject: bool = True  # False = warning only
+
+
+# A check looks at one variant against the original; returns an Issue or None
+Check = Callable[[TextFacts, TextFacts, str, ValidationContext], Optional[Issue]]
+
+
+# ----------------- Checks -----------------
+
+
+def check_overlap(original: TextFacts, variant: TextFacts, name: str, ctx: ValidationContext) -> Optional[Issue]:
+    """
+    Flag only *radical* rewrites: fewer than DRIFT_MIN_OVERLAP of the
+    original's meaningful words survive.
+    """
+    if not original.terms:
+        # Nothing meaningful in the original, nothing to compare
+        return None
+    kept = len(original.terms & variant.terms) / len(original.terms)
+    if kept < DRIFT_MIN_OVERLAP:
+        return Issue("overlap", name, f"only {kept:.0%} of the original terms kept")
+    return None
+
+
+def check_must_preserve(original: TextFacts, variant: TextFacts, name: str, ctx: ValidationContext) -> Optional[Issue]:
+    dropped = (original.terms & MUST_PRESERVE_TOKENS) - variant.terms
+    if dropped:
+        return Issue("must_preserve", name, f"dropped {sorted(dropped)}")
+    return None
+
+
+def check_numbers(original: TextFacts, variant: TextFacts, name: str, ctx: ValidationContext) -> Optional[Issue]:
+    """
+    Numbers in the narrative must survive, and the rewrite must not invent
+    new ones (the billed hours are the only number it may add).
+    """
+    missing = original.numbers - variant.numbers
+    if missing:
+        return Issue("numbers", name, f"dropped numbers {sorted(missing)}")
+    allowed = original.numbers
+    if ctx.hours is not None:
+        allowed = allowed | {repr(float(ctx.hours))}
+    added = variant.numbers - allowed
+    if added:
+        return Issue("numbers", name, f"introduced numbers {sorted(added)}")
+    return None
+
+
+def check_forbidden_terms(original: TextFacts, variant: TextFacts, name: str, ctx: ValidationContext) -> Optional[Issue]:
+    """
+    The client-compliant version must not contain the client's forbidden
+    terms. Introducing one rejects the rewrite; keeping one that was already
+    in the original is only a warning (the fallback would keep it too).
+    """
+    if ctx.forbidden is None or name != "client_compliant":
+        return None
+    found = {m.group(0).lower() for m in ctx.forbidden.finditer(variant.text)}
+    if not found:
+        return None
+    already = {m.group(0).lower() for m in ctx.forbidden.finditer(original.text)}
+    introduced = found - already
+    if introduced:
+        return Issue("forbidden_terms", name, f"introduced {sorted(introduced)}")
+    return Issue("forbidden_terms", name, f"kept {sorted(found)}", reject=False)
+
+
+DEFAULT_CHECKS: tuple[Check, ...] = (
+    check_overlap,
+    check_must_preserve,
+    check_numbers,
+    check_forbidden_terms,
+)
+
+
+# ----------------- Validator -----------------
+
+
+@dataclass
+class ValidationResult:
+    issues: list[Issue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not any(i.reject for i in self.issues)
+
+    @property
+    def rejections(self) -> list[Issue]:
+        return [i for i in self.issues if i.reject]
+
+
+class Validator:
+    """
+    Runs every check on every variant of a rewrite, tokenizing each text
+    exactly once. Checks are plain functions, so adding one is appending to
+    `checks`.
+    """
+
+    def __init__(self, checks: Iterable[Check] = DEFAULT_CHECKS, variants: tuple[str, ...] = VARIANTS):
+        self.checks = tuple(checks)
+        self.variants = variants
+
+    def _run(self, original: TextFacts, rewrite: RewriteResponse, ctx: ValidationContext, facts_cache: dict) -> ValidationResult:
+        result = ValidationResult()
+        for name in self.variants:
+            text = getattr(rewrite, name)
+            variant = facts_cache.get(text)
+            if variant is None:
+                variant = facts_cache[text] = analyze(text)
+            for check in self.checks:
+                issue = check(original, variant, name, ctx)
+                if issue is not None:
+                    result.issues.append(issue)
+        return result
+
+    def validate(self, original: str, rewrite: RewriteResponse, ctx: Optional[ValidationContext] = None) -> ValidationResult:
+        facts = analyze(original)
+        # The three variants are often identical; analyze each text once
+        return self._run(facts, rewrite, ctx or ValidationContext(), {})
+
+
+default_validator = Validator()
@@ -0,0 +1,4 @@
+"""
+Benchmarks and load tests. Run individual scripts with
+`python -m benchmarks.<name>` from the repository root.
+"""
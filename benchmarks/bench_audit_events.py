@@ -0,0 +1,148 @@
+"""
+GET /admin/audit-events at scale: the old per-event lookups (3 extra
+queries per row) against the single joined keyset query, on a throwaway
+SQLite database.
+
+    python -m benchmarks.bench_audit_events --rows 100000
+    python -m benchmarks.bench_audit_events --rows 100000 --no-indexes
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import AuditEvent, Client, RewriteRecord, TimeEntry
+from app.routers.admin import query_audit_events
+from app.schemas import AuditEntryOut, ClientOut
+
+CLIENTS = ["C001", "C002", "C003"]
+USERS = ["admin", "demo", "alice", "bob", "carol"]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def populate(engine, rows: int, chunk: int = 5000) -> None:
+    rng = random.Random(13)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Client), [{"id": c, "name": f"Client {c}", "code": c} for c in CLIENTS])
+        for base in range(0, rows, chunk):
+            te, rw, ae = [], [], []
+            for i in range(base, min(base + chunk, rows)):
+                ts = start + timedelta(seconds=i * 30 + rng.randint(0, 29))
+                client = rng.choice(CLIENTS)
+                te.append({"id": f"TE-{i}", "client_id": client, "original": f"Review documents batch {i}", "hours": 0.5, "created_at": ts})
+                rw.append({
+                    "id": f"RW-{i}", "time_entry_id": f"TE-{i}", "standard": f"Reviewed documents, batch {i}.",
+                    "client_compliant": f"Reviewed documents, batch {i}.", "audit_safe": f"Reviewed documents, batch {i}.",
+                    "notes": "", "tier": "llm", "created_at": ts,
+                })
+                ae.append({
+                    "id": f"AE-{i}", "timestamp": ts, "username": rng.choice(USERS), "role": "user",
+                    "client_id": client, "time_entry_id": f"TE-{i}", "rewrite_id": f"RW-{i}",
+                    "model_name": "bench", "rules_snapshot": "{}",
+                })
+            conn.execute(insert(TimeEntry), te)
+            conn.execute(insert(RewriteRecord), rw)
+            conn.execute(insert(AuditEvent), ae)
+
+
+def legacy_audit_events(db, limit: int) -> list[AuditEntryOut]:
+    """
+    The endpoint as it was before keyset pagination.
+    """
+    events = db.query(AuditEvent).order_by(AuditEvent.timestamp.desc()).limit(limit).all()
+    results = []
+    for ev in events:
+        te = db.query(TimeEntry).filter(TimeEntry.id == ev.time_entry_id).first()
+        rw = db.query(RewriteRecord).filter(RewriteRecord.id == ev.rewrite_id).first()
+        client = db.query(Client).filter(Client.id == ev.client_id).first()
+        if not te or not rw or not client:
+            continue
+        results.append(
+            AuditEntryOut(
+                id=ev.id, timestamp=ev.timestamp, username=ev.username, role=ev.role,
+                client=ClientOut.model_validate(client), time_entry_id=te.id, rewrite_id=rw.id,
+                original=te.original, standard=rw.standard, client_compliant=rw.client_compliant,
+                audit_safe=rw.audit_safe, notes=rw.notes or "",
+            )
+        )
+    return results
+
+
+def measure(name: str, Session, counter: QueryCounter, fn, repeat: int) -> None:
+    timings, queries, rows = [], 0, 0
+    for _ in range(repeat):
+        db = Session()
+        try:
+            before = counter.count
+            start = time.perf_counter()
+            rows = fn(db)
+            timings.append(time.perf_counter() - start)
+            queries = counter.count - before
+        finally:
+            db.close()
+    print(
+        f"  {name:<34} rows={rows:<6} queries={queries:<5} "
+        f"p50={statistics.median(timings) * 1000:8.2f} ms  max={max(timings) * 1000:8.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Audit-events query benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20, help="pages to walk with the cursor")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-indexes", action="store_true", help="drop the composite audit indexes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        if args.no_indexes:
+            for index in AuditEvent.__table__.indexes:
+                if index.name.startswith("ix_audit_events_") and len(index.columns) > 1:
+                    index.drop(engine)
+        print(f"populating {args.rows} audit events ...")
+        populate(engine, args.rows)
+        Session = sessionmaker(bind=engine)
+        counter = QueryCounter(engine)
+        limit = args.limit
+
+        def walk(db, **filters):
+            cursor, total = None, 0
+            for _ in range(args.pages):
+                page, cursor = query_audit_events(db, limit=limit, cursor=cursor, **filters)
+                total += len(page)
+                if cursor is None:
+                    break
+            return total
+
+        mid = datetime(2025, 1, 1) + timedelta(seconds=args.rows * 15)
+        print(f"limit={limit}, best of {args.repeat}")
+        measure("legacy (N+1)", Session, counter, lambda db: len(legacy_audit_events(db, limit)), args.repeat)
+        measure("joined, first page", Session, counter, lambda db: len(query_audit_events(db, limit=limit)[0]), args.repeat)
+        measure(f"joined, walk {args.pages} pages", Session, counter, walk, args.repeat)
+        measure("joined, client filter", Session, counter, lambda db: len(query_audit_events(db, limit=limit, client_id="C002")[0]), args.repeat)
+        measure("joined, username + date range", Session, counter, lambda db: len(query_audit_events(
+            db, limit=limit, username="alice", since=mid - timedelta(days=2), until=mid)[0]), args.repeat)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
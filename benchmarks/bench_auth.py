@@ -0,0 +1,102 @@
+"""
+Per-request authentication overhead: get_current_user with and without the
+principal cache (app/principals.py).
+
+Calls the dependency directly against a throwaway SQLite database holding
+`--users` accounts, replaying `--requests` authenticated requests spread over
+`--tokens` distinct live tokens (a few busy users, many occasional ones).
+Reports time per call and users queries per call.
+
+    python -m benchmarks.bench_auth --users 1000 --tokens 200 --requests 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app import deps
+from app.auth import create_access_token
+from app.db import Base, configure_sqlite, sqlite_pragmas
+from app.models import User
+from app.principals import PrincipalCache
+
+
+def make_request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+def run_case(name: str, cache: PrincipalCache, Session, queries: list[int], requests: list[Request]) -> None:
+    deps.principal_cache = cache
+    queries[0] = 0
+    latencies: list[float] = []
+    started = time.perf_counter()
+    for request in requests:
+        db = Session()
+        start = time.perf_counter()
+        deps.get_current_user(request, db)
+        latencies.append(time.perf_counter() - start)
+        db.close()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    stats = cache.stats()
+    print(
+        f"  {name:<10} mean={statistics.fmean(latencies) * 1e6:8.1f} us  "
+        f"p50={statistics.median(latencies) * 1e6:8.1f} us  p95={p95 * 1e6:8.1f} us  "
+        f"queries/req={queries[0] / len(requests):.3f}  hit_rate={stats['hit_rate']:.3f}  "
+        f"({len(requests) / elapsed:,.0f} req/s incl. session setup)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="get_current_user overhead")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tokens", type=int, default=200, help="distinct live tokens in the replay")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--ttl", type=float, default=60.0)
+    parser.add_argument("--max-entries", type=int, default=4096)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False})
+        configure_sqlite(engine, sqlite_pragmas())
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        db = Session()
+        db.add_all(
+            User(username=f"user{i}", password_hash="x", role="user", is_active=True) for i in range(args.users)
+        )
+        db.commit()
+        db.close()
+
+        queries = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(conn, cursor, statement, parameters, context, executemany):
+            queries[0] += 1
+
+        rng = random.Random(0)
+        tokens = [
+            create_access_token({"sub": f"user{rng.randrange(args.users)}", "role": "user"})
+            for _ in range(args.tokens)
+        ]
+        # Zipf-ish: token k is picked with weight 1/(k+1)
+        weights = [1.0 / (k + 1) for k in range(len(tokens))]
+        requests = [make_request(t) for t in rng.choices(tokens, weights, k=args.requests)]
+
+        print(f"{args.users} users, {args.tokens} tokens, {args.requests} requests")
+        run_case("uncached", PrincipalCache(max_entries=0, ttl_seconds=0), Session, queries, requests)
+        run_case("cached", PrincipalCache(max_entries=args.max_entries, ttl_seconds=args.ttl), Session, queries, requests)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Worker cold start: time from a fresh interpreter to the first served request.
+
+Each run spawns a new Python process in a scratch directory that imports
+main, runs the app lifespan startup and answers GET /health in-process.
+Reported separately:
+
+- import:  `import main`
+- startup: lifespan startup (schema, seed, HTTP client, workers)
+- first:   the first request
+- wall:    the whole subprocess, interpreter start to exit
+
+Cases: a fresh database (first deploy), an initialised one (every later
+worker start), and `--workers` processes starting together on a fresh
+database (they must not race on schema creation or seeding).
+
+    python -m benchmarks.bench_startup --runs 5 --workers 4
+    python -m benchmarks.bench_startup --repo /path/to/other/checkout   # compare trees
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ["jose", "passlib", "bcrypt", "httpx"]
+
+
+async def _child_serve(main) -> dict:
+    import httpx
+
+    timings = {}
+    start = time.perf_counter()
+    async with main.lifespan(main.app):
+        timings["startup"] = time.perf_counter() - start
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            resp = await client.get("/health")
+            timings["first"] = time.perf_counter() - start
+            timings["status"] = resp.status_code
+    return timings
+
+
+def child(repo: str) -> None:
+    sys.path.insert(0, repo)
+    start = time.perf_counter()
+    import main
+
+    result = {"import": time.perf_counter() - start}
+    result["heavy_after_import"] = [m for m in HEAVY_MODULES if m in sys.modules]
+    result.update(asyncio.run(_child_serve(main)))
+    print(json.dumps(result))
+
+
+def spawn(repo: str, cwd: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--repo", repo],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__)))},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def collect(proc: subprocess.Popen, started: float) -> dict:
+    out, err = proc.communicate()
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        # The "SomeError: message" line, not the SQL and links that follow it
+        lines = [line for line in err.splitlines() if re.match(r"^[\w.]+(Error|Exception): ", line)]
+        return {"error": lines[-1][:200] if lines else f"exit {proc.returncode}", "wall": wall}
+    result = json.loads(out.strip().splitlines()[-1])
+    result["wall"] = wall
+    return result
+
+
+def report(name: str, results: list[dict]) -> None:
+    ok = [r for r in results if "error" not in r]
+    errors = [r["error"] for r in results if "error" in r]
+    print(f"  {name}  ({len(ok)}/{len(results)} ok)")
+    for key in ("import", "startup", "first", "wall"):
+        values = [r[key] for r in ok]
+        if values:
+            print(f"    {key:<8} median={statistics.median(values) * 1000:8.1f} ms  max={max(values) * 1000:8.1f} ms")
+    if ok:
+        print(f"    heavy modules after import: {ok[0]['heavy_after_import'] or 'none'}")
+    for e in errors:
+        print(f"    ERROR: {e}")
+
+
+def users_in(cwd: str) -> int:
+    conn = sqlite3.connect(os.path.join(cwd, "time_rewrite.db"))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="processes started together on a fresh database")
+    parser.add_argument("--repo", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    if args.child:
+        child(repo)
+        return
+
+    print(f"{repo}: {args.runs} runs, {args.workers} concurrent workers")
+    fresh, warm = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            fresh.append(collect(spawn(repo, tmp), started))
+            started = time.perf_counter()
+            warm.append(collect(spawn(repo, tmp), started))
+    report("fresh database", fresh)
+    report("initialised database", warm)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        procs = [spawn(repo, tmp) for _ in range(args.workers)]
+        together = [collect(p, started) for p in procs]
+        report(f"{args.workers} workers at once, fresh database", together)
+        print(f"    users seeded: {users_in(tmp)} (expected 2)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark for the output-validation stage (app/validation.py).
+
+Compares, per item:
+- legacy: the old per-call drift check (regex + STOPWORDS filter rebuilt
+  for each text), run on all three variants for a fair comparison
+- validate: Validator.validate, one item at a time
+
+    python -m benchmarks.bench_validation --items 500 --repeat 5
+"""
+import argparse
+import random
+import re
+import time
+
+from app.profiles import compile_terms
+from app.schemas import RewriteResponse
+from app.validation import (
+    DRIFT_MIN_OVERLAP,
+    MUST_PRESERVE_TOKENS,
+    STOPWORDS,
+    ValidationContext,
+    default_validator,
+)
+
+NARRATIVES = [
+    "Review correspondence re discovery",
+    "Draft motion to compel production of 2019 documents",
+    "Telephone conference with client regarding settlement",
+    "Email review and miscellaneous follow up",
+    "Analyze 3 deposition transcripts for trial preparation",
+    "Prepare privilege log for 45 documents",
+]
+
+
+def _legacy_too_much_drift(original: str, rewritten: str) -> bool:
+    o_set = {w for w in re.findall(r"\b\w+\b", original.lower()) if w not in STOPWORDS}
+    r_set = {w for w in re.findall(r"\b\w+\b", rewritten.lower()) if w not in STOPWORDS}
+    if not o_set:
+        return False
+    missing = o_set - r_set
+    if 1.0 - len(missing) / len(o_set) < DRIFT_MIN_OVERLAP:
+        return True
+    return any(t in MUST_PRESERVE_TOKENS and t in missing for t in o_set)
+
+
+def make_items(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    forbidden = compile_terms(["email review", "miscellaneous"])
+    items = []
+    for _ in range(n):
+        original = rng.choice(NARRATIVES)
+        text = "Reviewed and analyzed: " + original.lower() + "."
+        rewrite = RewriteResponse(standard=text, client_compliant=text, audit_safe=text + " (detailed)", notes="")
+        items.append((original, rewrite, ValidationContext(hours=0.2, forbidden=forbidden)))
+    return items
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+
+    def legacy():
+        for original, rw, _ in items:
+            for text in (rw.standard, rw.client_compliant, rw.audit_safe):
+                _legacy_too_much_drift(original, text)
+
+    def single():
+        for original, rw, ctx in items:
+            default_validator.validate(original, rw, ctx)
+
+    print(f"{args.items} items, best of {args.repeat}")
+    for name, fn in (("legacy (drift only)", legacy), ("validate", single)):
+        elapsed = _time(fn, args.repeat)
+        print(f"  {name:<20} {elapsed * 1e6 / args.items:8.2f} us/item")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+rewrite-and-save write throughput with concurrent writers.
+
+Each writer thread persists rewrites through its own session against a
+throwaway SQLite database, like the DB thread pool does. Compared:
+
+- legacy: three commits and two refreshes per rewrite, default pragmas
+- single transaction, default pragmas
+- single transaction, pragmas from Settings (WAL, synchronous, ...)
+- the same with audit events group-committed by app/audit.py
+
+    python -m benchmarks.bench_write_throughput --writers 4 --saves 500
+"""
+import argparse
+import functools
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.audit import AuditWriter
+from app.config import settings
+from app.db import Base, configure_sqlite, sqlite_pragmas
+from app.models import AuditEvent, Client, RewriteRecord, TimeEntry
+from app.profiles import compile_profile
+from app.routers.rewrites import _save_rewrite
+from app.schemas import RewriteAndSaveRequest, RewriteResponse
+
+PAYLOAD = RewriteAndSaveRequest(client_id="C001", original="Review documents for production", hours=0.5)
+REWRITE = RewriteResponse(
+    standard="Reviewed documents for production.",
+    client_compliant="Reviewed documents for production.",
+    audit_safe="Reviewed documents for production.",
+    notes="",
+)
+_ids = iter(range(10**9))
+_ids_lock = threading.Lock()
+
+
+def legacy_save(db, profile, payload, rewrite, username, role):
+    """
+    rewrite-and-save persistence as it was: one commit per row.
+    """
+    with _ids_lock:
+        n = next(_ids)
+    te = TimeEntry(id=f"TE-L{n}", client_id=profile.client_id, original=payload.original, hours=payload.hours)
+    db.add(te)
+    db.commit()
+    db.refresh(te)
+    rw = RewriteRecord(
+        id=f"RW-L{n}", time_entry_id=te.id, standard=rewrite.standard,
+        client_compliant=rewrite.client_compliant, audit_safe=rewrite.audit_safe, notes=rewrite.notes,
+    )
+    db.add(rw)
+    db.commit()
+    db.refresh(rw)
+    db.add(
+        AuditEvent(
+            id=f"AE-L{n}", timestamp=datetime.utcnow(), username=username, role=role,
+            client_id=profile.client_id, time_entry_id=te.id, rewrite_id=rw.id,
+            model_name="bench", rules_snapshot=profile.rules_json,
+        )
+    )
+    db.commit()
+
+
+def run_case(name: str, save, pragmas: dict, writers: int, saves: int, group_commit: bool = False) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            connect_args={"check_same_thread": False},
+            pool_size=writers,
+        )
+        configure_sqlite(engine, pragmas)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        client = Client(id="C001", name="Acme Manufacturing", code="ACME001")
+        db = Session()
+        db.add(client)
+        db.commit()
+        profile = compile_profile(client)
+        db.close()
+
+        audit = None
+        if group_commit:
+            audit = AuditWriter(
+                batch_size=settings.audit_batch_size,
+                flush_interval=settings.audit_flush_interval_ms / 1000.0,
+                max_queue=settings.audit_max_queue,
+                submit_timeout=settings.audit_submit_timeout,
+                session_factory=Session,
+            )
+            audit.start()
+            save = functools.partial(save, writer=audit)
+
+        latencies: list[float] = []
+        errors = 0
+        lock = threading.Lock()
+
+        def writer():
+            nonlocal errors
+            db = Session()
+            try:
+                for _ in range(saves):
+                    start = time.perf_counter()
+                    try:
+                        save(db, profile, PAYLOAD, REWRITE, "bench", "user")
+                    except Exception:
+                        db.rollback()
+                        with lock:
+                            errors += 1
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if audit is not None:
+            audit.stop()  # the drain counts towards the elapsed time
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    median = statistics.median(latencies) if latencies else 0.0
+    print(
+        f"  {name:<34} {len(latencies) / elapsed:8.1f} saves/s  "
+        f"p50={median * 1000:7.2f} ms  p95={p95 * 1000:7.2f} ms  errors={errors}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="rewrite-and-save write throughput")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--saves", type=int, default=500, help="saves per writer")
+    args = parser.parse_args()
+
+    defaults = {"busy_timeout": 5000}  # so the baseline measures waiting, not lock errors
+    tuned = sqlite_pragmas()
+    print(f"{args.writers} writers x {args.saves} saves; tuned pragmas: {tuned}")
+    run_case("legacy (3 commits), default", legacy_save, defaults, args.writers, args.saves)
+    run_case("single transaction, default", _save_rewrite, defaults, args.writers, args.saves)
+    run_case("single transaction, tuned", _save_rewrite, tuned, args.writers, args.saves)
+    run_case("group-commit audit, tuned", _save_rewrite, tuned, args.writers, args.saves, group_commit=True)
+
+
+if __name__ == "__main__":
+    main()
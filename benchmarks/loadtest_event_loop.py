@@ -0,0 +1,112 @@
+"""
+Event-loop stall under concurrent saves.
+
+Drives POST /rewrites/rewrite-and-save in-process (httpx ASGI transport)
+against a throwaway SQLite database while a probe task measures how late
+the event loop wakes it up. Entries are formulaic, so they are answered by
+the rules tier and no Ollama server is needed: the load is pure DB writes.
+
+    python -m benchmarks.loadtest_event_loop --requests 400 --concurrency 16
+    python -m benchmarks.loadtest_event_loop --inline   # DB calls on the loop (old behaviour)
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+NARRATIVES = [
+    "email review re discovery",
+    "draft motion to compel",
+    "t/c w/ opposing counsel re depo schedule",
+    "review documents for production",
+    "prepare privilege log",
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def probe_loop_lag(stop: asyncio.Event, samples: list[float], interval: float = 0.005) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+async def run(args) -> None:
+    import httpx
+
+    import main
+    from app.config import settings
+
+    if args.inline:
+        settings.db_executor_workers = 0
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            resp = await client.post("/auth/login", json={"username": "demo", "password": "demo123"})
+            headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+            lag: list[float] = []
+            latencies: list[float] = []
+            errors = 0
+            stop = asyncio.Event()
+            probe = asyncio.create_task(probe_loop_lag(stop, lag))
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(i: int) -> None:
+                nonlocal errors
+                payload = {
+                    "client_id": ("C001", "C002", "C003")[i % 3],
+                    "original": NARRATIVES[i % len(NARRATIVES)],
+                    "hours": 0.1 * (1 + i % 10),
+                }
+                async with semaphore:
+                    start = time.perf_counter()
+                    r = await client.post("/rewrites/rewrite-and-save", json=payload, headers=headers)
+                    latencies.append(time.perf_counter() - start)
+                    if r.status_code != 200:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await probe
+
+    mode = "inline (on the event loop)" if args.inline else f"DB thread pool ({settings.db_executor_workers} workers)"
+    print(f"{args.requests} saves, concurrency {args.concurrency}, {mode}")
+    print(f"  throughput       {args.requests / elapsed:8.1f} req/s   errors={errors}")
+    print(f"  request latency  p50={statistics.median(latencies) * 1000:7.2f} ms  p95={percentile(latencies, 0.95) * 1000:7.2f} ms")
+    print(
+        f"  loop lag         p50={statistics.median(lag) * 1000:7.2f} ms  p99={percentile(lag, 0.99) * 1000:7.2f} ms"
+        f"  max={max(lag) * 1000:7.2f} ms  ({len(lag)} samples)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Event-loop stall load test")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--inline", action="store_true", help="run DB calls on the event loop (baseline)")
+    args = parser.parse_args()
+
+    # The app opens ./time_rewrite.db, so run it from a scratch directory
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
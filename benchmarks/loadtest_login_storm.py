@@ -0,0 +1,131 @@
+"""
+Login storm: do other endpoints stay responsive while many users log in?
+
+Drives the app in-process (httpx ASGI transport) against a throwaway SQLite
+database. `--logins` POST /auth/login calls run with `--concurrency` in
+flight, while a probe keeps calling GET /clients/ (a sync endpoint, served
+from the same threadpool the old login used) and the event loop is sampled
+for lag.
+
+Two cases:
+
+- legacy: the old sync login, bcrypt on the shared endpoint threadpool
+- pool:   /auth/login, bcrypt on the dedicated password hashing pool
+
+    python -m benchmarks.loadtest_login_storm --logins 200 --concurrency 64 --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.loadtest_event_loop import percentile, probe_loop_lag
+
+
+def add_legacy_login(app) -> None:
+    """
+    Mount the pre-pool login handler at /bench/legacy-login.
+    """
+    from fastapi import Depends, HTTPException
+
+    from app.auth import create_access_token, verify_password
+    from app.deps import get_db
+    from app.models import User
+    from app.routers.auth import LoginPayload
+
+    @app.post("/bench/legacy-login")
+    def legacy_login(payload: LoginPayload, db=Depends(get_db)):
+        user = db.query(User).filter(User.username == payload.username, User.is_active == True).first()
+        if not user or not verify_password(payload.password, user.password_hash):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {"access_token": create_access_token({"sub": user.username, "role": user.role})}
+
+
+async def storm(client, path: str, args) -> None:
+    latencies: list[float] = []
+    probe_latencies: list[float] = []
+    lag: list[float] = []
+    statuses: dict[int, int] = {}
+    stop = asyncio.Event()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            r = await client.post(path, json={"username": "demo", "password": "demo123"})
+            latencies.append(time.perf_counter() - start)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    async def probe() -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            await client.get("/clients/")
+            probe_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    lag_task = asyncio.create_task(probe_loop_lag(stop, lag))
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(lag_task, probe_task)
+
+    ok = statuses.get(200, 0)
+    print(f"  {path}")
+    print(f"    logins         {ok / elapsed:8.1f} ok/s   statuses={dict(sorted(statuses.items()))}")
+    print(f"    login latency  p50={statistics.median(latencies) * 1000:8.1f} ms  p95={percentile(latencies, 0.95) * 1000:8.1f} ms")
+    print(
+        f"    GET /clients/  p50={statistics.median(probe_latencies) * 1000:8.1f} ms  "
+        f"p95={percentile(probe_latencies, 0.95) * 1000:8.1f} ms  max={max(probe_latencies) * 1000:8.1f} ms  "
+        f"({len(probe_latencies)} probes)"
+    )
+    print(f"    loop lag       p99={percentile(lag, 0.99) * 1000:8.1f} ms  max={max(lag) * 1000:8.1f} ms")
+
+
+async def run(args) -> None:
+    from app.config import settings
+
+    # Before app.auth builds its CryptContext and pool
+    settings.bcrypt_rounds = args.rounds
+    settings.password_hash_workers = args.workers
+    settings.password_hash_max_pending = args.max_pending
+
+    import httpx
+
+    import main
+
+    add_legacy_login(main.app)
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(
+                f"{args.logins} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}, "
+                f"hash pool {args.workers} workers / {args.max_pending} pending, {os.cpu_count()} CPUs"
+            )
+            await storm(client, "/bench/legacy-login", args)
+            await storm(client, "/auth/login", args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Login storm load test")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt work factor")
+    parser.add_argument("--workers", type=int, default=2, help="password hashing threads")
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    # The app opens ./time_rewrite.db, so run it from a scratch directory
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
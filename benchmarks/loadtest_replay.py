@@ -0,0 +1,417 @@
+"""
+Workload replay against the app and a stub Ollama server.
+
+Starts benchmarks.stub_ollama in a subprocess (or uses `--ollama-url`), runs
+the app in-process (httpx ASGI transport) on a throwaway SQLite database and
+replays a workload at a fixed concurrency. Each workload line is one call:
+
+    {"op": "rewrite", "original": "...", "hours": 0.5}
+    {"op": "save", "client_id": "C001", "original": "...", "hours": 1.2}
+    {"op": "recent", "limit": 20}
+    {"op": "audit", "limit": 50}
+
+(POST /rewrites/rewrite, POST /rewrites/rewrite-and-save as demo, GET
+/rewrites/recent as demo, GET /admin/audit-events as admin). Without
+`--workload` one is generated from `--requests`, `--mix` and `--seed`;
+`--write-workload` saves it for later runs.
+
+Reports throughput and p50/p95/p99 latency per op, event-loop lag, SQL
+statements per request and rewrite tiers, and writes them to `--output` as
+JSON. `--compare` prints the differences between two such files.
+
+    python -m benchmarks.loadtest_replay --requests 500 --concurrency 16 --output base.json
+    python -m benchmarks.loadtest_replay --malformed-rate 0.1 --timeout-rate 0.02 --llm-timeout 2
+    python -m benchmarks.loadtest_replay --compare base.json new.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from benchmarks.loadtest_event_loop import percentile, probe_loop_lag
+from benchmarks.stub_ollama import add_stub_arguments, stub_argv
+
+OPS = {
+    "rewrite": ("POST", "/rewrites/rewrite"),
+    "save": ("POST", "/rewrites/rewrite-and-save"),
+    "recent": ("GET", "/rewrites/recent"),
+    "audit": ("GET", "/admin/audit-events"),
+}
+CLIENTS = ["C001", "C002", "C003"]
+
+# Short, routine entries the rules tier answers without the model
+FORMULAIC = [
+    "email review re discovery",
+    "draft motion to compel",
+    "t/c w/ opposing counsel re depo schedule",
+    "review documents for production",
+    "prepare privilege log",
+]
+# Longer narratives that go to the model; combined so few repeat
+ACTIONS = ["Reviewed and analyzed", "Drafted revisions to", "Prepared outline of", "Researched case law on"]
+SUBJECTS = [
+    "the plant manager's deposition testimony",
+    "third-party subpoena responses",
+    "the indemnification provisions of the supply agreement",
+    "expert witness disclosures",
+    "the litigation hold notice for the regional sales team",
+    "insurer coverage correspondence",
+]
+PURPOSES = [
+    "to identify inconsistencies for cross-examination",
+    "in preparation for the mediation session",
+    "for the client status report",
+    "ahead of the scheduling conference",
+]
+
+
+def generate_workload(requests: int, mix: dict[str, int], seed: int, formulaic_share: float) -> list[dict]:
+    rng = random.Random(seed)
+    ops = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    workload = []
+    for op in ops:
+        if op in ("rewrite", "save"):
+            if rng.random() < formulaic_share:
+                original = rng.choice(FORMULAIC)
+            else:
+                original = f"{rng.choice(ACTIONS)} {rng.choice(SUBJECTS)} {rng.choice(PURPOSES)}"
+            item = {"op": op, "original": original, "hours": round(rng.choice(range(1, 40)) / 10, 1)}
+            if op == "save":
+                item["client_id"] = rng.choice(CLIENTS)
+        else:
+            item = {"op": op, "limit": 20 if op == "recent" else 50}
+        workload.append(item)
+    return workload
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPS:
+            raise SystemExit(f"unknown op {op!r} in --mix (expected {', '.join(OPS)})")
+        mix[op] = int(weight or 1)
+    return mix
+
+
+def load_workload(path: str) -> list[dict]:
+    with open(path) as f:
+        workload = [json.loads(line) for line in f if line.strip()]
+    for item in workload:
+        if item.get("op") not in OPS:
+            raise SystemExit(f"{path}: unknown op in {item}")
+    return workload
+
+
+# ----------------- Stub Ollama -----------------
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(args, repo_root: str) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_ollama", "--port", str(port), *stub_argv(args)],
+        cwd=repo_root,
+        stdout=subprocess.DEVNULL,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(url: str, proc: Optional[subprocess.Popen], timeout: float = 15.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise SystemExit(f"stub Ollama exited with {proc.returncode}")
+            try:
+                if (await client.get(url + "/api/tags")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise SystemExit(f"Ollama at {url} not ready after {timeout:.0f}s")
+
+
+async def stub_stats(url: str) -> Optional[dict]:
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        try:
+            resp = await client.get(url + "/stats")
+        except httpx.TransportError:
+            return None
+        return resp.json() if resp.status_code == 200 else None
+
+
+# ----------------- Replay -----------------
+
+# SQL statements per request: set by each replayed call; the sync endpoint
+# threadpool and run_in_db copy context, so their queries count too
+_queries: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("bench_queries", default=None)
+
+
+def count_queries(engine) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def tier_of(op: str, body) -> Optional[str]:
+    if op == "rewrite":
+        return body.get("tier")
+    if op == "save":
+        return body.get("rewrite", {}).get("tier")
+    return None
+
+
+async def replay(client, workload: list[dict], tokens: dict[str, str], concurrency: int) -> tuple[dict, float, list]:
+    results = {op: {"latencies": [], "queries": [], "statuses": {}, "tiers": {}} for op in OPS}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(item: dict) -> None:
+        op = item["op"]
+        method, path = OPS[op]
+        headers = {"Authorization": f"Bearer {tokens['admin' if op == 'audit' else 'demo']}"}
+        if method == "POST":
+            payload = {k: v for k, v in item.items() if k != "op"}
+            kwargs = {"json": payload}
+        else:
+            kwargs = {"params": {"limit": item.get("limit", 20)}}
+        async with semaphore:
+            counter = [0]
+            token = _queries.set(counter)
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, path, headers=headers, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _queries.reset(token)
+        r = results[op]
+        r["latencies"].append(elapsed)
+        r["queries"].append(counter[0])
+        r["statuses"][resp.status_code] = r["statuses"].get(resp.status_code, 0) + 1
+        if resp.status_code == 200:
+            tier = tier_of(op, resp.json())
+            if tier:
+                r["tiers"][tier] = r["tiers"].get(tier, 0) + 1
+
+    lag: list[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(probe_loop_lag(stop, lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(call(item) for item in workload))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    return results, elapsed, lag
+
+
+def summarize(results: dict, elapsed: float, lag: list[float]) -> dict:
+    def ms(value: float) -> float:
+        return round(value * 1000, 2)
+
+    ops = {}
+    for op, r in results.items():
+        if not r["latencies"]:
+            continue
+        lat = r["latencies"]
+        ok = r["statuses"].get(200, 0)
+        ops[op] = {
+            "requests": len(lat),
+            "ok": ok,
+            "statuses": {str(k): v for k, v in sorted(r["statuses"].items())},
+            "throughput_rps": round(ok / elapsed, 2),
+            "p50_ms": ms(percentile(lat, 0.50)),
+            "p95_ms": ms(percentile(lat, 0.95)),
+            "p99_ms": ms(percentile(lat, 0.99)),
+            "max_ms": ms(max(lat)),
+            "db_queries_mean": round(sum(r["queries"]) / len(r["queries"]), 2),
+            "db_queries_max": max(r["queries"]),
+            "tiers": r["tiers"],
+        }
+    total = sum(o["requests"] for o in ops.values())
+    ok = sum(o["ok"] for o in ops.values())
+    return {
+        "overall": {
+            "requests": total,
+            "ok": ok,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(ok / elapsed, 2),
+        },
+        "ops": ops,
+        "loop_lag": {
+            "p50_ms": ms(percentile(lag, 0.50)),
+            "p99_ms": ms(percentile(lag, 0.99)),
+            "max_ms": ms(max(lag, default=0.0)),
+        },
+    }
+
+
+def print_summary(summary: dict) -> None:
+    o = summary["overall"]
+    print(f"  {o['ok']}/{o['requests']} ok in {o['elapsed_s']:.2f}s  ({o['throughput_rps']:.1f} ok/s)")
+    for op, s in summary["ops"].items():
+        tiers = f"  tiers={s['tiers']}" if s["tiers"] else ""
+        print(
+            f"    {op:<8} {s['throughput_rps']:7.1f}/s  p50={s['p50_ms']:8.1f} ms  p95={s['p95_ms']:8.1f} ms  "
+            f"p99={s['p99_ms']:8.1f} ms  queries={s['db_queries_mean']:5.1f}  statuses={s['statuses']}{tiers}"
+        )
+    lag = summary["loop_lag"]
+    print(f"    loop lag p50={lag['p50_ms']:.1f} ms  p99={lag['p99_ms']:.1f} ms  max={lag['max_ms']:.1f} ms")
+    if summary.get("stub"):
+        print(f"    stub     {summary['stub']}")
+
+
+def git_revision(repo_root: str) -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=repo_root, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+async def run(args, workload: list[dict], ollama_url: str, stub: Optional[subprocess.Popen]) -> dict:
+    from app.config import settings
+
+    # Before the app builds its backend pool and HTTP client
+    settings.ollama_url = ollama_url
+    settings.ollama_backends = []
+    settings.ollama_timeout = args.llm_timeout
+    settings.rewrite_cache_enabled = not args.no_cache
+
+    import httpx
+
+    import main
+    from app.db import engine
+
+    await wait_ready(ollama_url, stub)
+    count_queries(engine)
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            tokens = {}
+            for username, password in (("demo", "demo123"), ("admin", "admin123")):
+                resp = await client.post("/auth/login", json={"username": username, "password": password})
+                tokens[username] = resp.json()["access_token"]
+            results, elapsed, lag = await replay(client, workload, tokens, args.concurrency)
+    summary = summarize(results, elapsed, lag)
+    summary["stub"] = await stub_stats(ollama_url) if stub is not None else None
+    return summary
+
+
+# ----------------- Comparing runs -----------------
+
+
+def compare(base_path: str, new_path: str) -> None:
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def delta(a: float, b: float) -> str:
+        if not a:
+            return "     n/a"
+        return f"{(b - a) / a * 100:+7.1f}%"
+
+    print(f"{base_path} ({base['meta'].get('git')}) -> {new_path} ({new['meta'].get('git')})")
+    a, b = base["overall"], new["overall"]
+    print(f"  overall  {a['throughput_rps']:8.1f} -> {b['throughput_rps']:8.1f} ok/s {delta(a['throughput_rps'], b['throughput_rps'])}")
+    for op in OPS:
+        if op not in base["ops"] or op not in new["ops"]:
+            continue
+        a, b = base["ops"][op], new["ops"][op]
+        print(f"  {op}")
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "db_queries_mean"):
+            print(f"    {key:<16} {a[key]:10.2f} -> {b[key]:10.2f} {delta(a[key], b[key])}")
+    a, b = base["loop_lag"], new["loop_lag"]
+    print(f"  loop lag p99     {a['p99_ms']:10.2f} -> {b['p99_ms']:10.2f} {delta(a['p99_ms'], b['p99_ms'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Workload replay load test")
+    parser.add_argument("--workload", help="JSONL workload to replay (default: generate one)")
+    parser.add_argument("--requests", type=int, default=300, help="size of a generated workload")
+    parser.add_argument("--mix", default="rewrite=3,save=5,recent=1,audit=1", help="op weights of a generated workload")
+    parser.add_argument("--formulaic-share", type=float, default=0.3, help="generated entries the rules tier answers")
+    parser.add_argument("--write-workload", help="save the workload as JSONL and exit")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1, help="workload generation and stub fault injection")
+    parser.add_argument("--llm-timeout", type=float, default=10.0, help="settings.ollama_timeout for the run")
+    parser.add_argument("--no-cache", action="store_true", help="disable the rewrite cache")
+    parser.add_argument("--ollama-url", help="use this Ollama server instead of starting the stub")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two --output files and exit")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.workload:
+        workload = load_workload(args.workload)
+    else:
+        workload = generate_workload(args.requests, parse_mix(args.mix), args.seed, args.formulaic_share)
+    if args.write_workload:
+        with open(args.write_workload, "w") as f:
+            f.writelines(json.dumps(item) + "\n" for item in workload)
+        print(f"wrote {len(workload)} requests to {args.write_workload}")
+        return
+
+    output = os.path.abspath(args.output) if args.output else None
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    stub, ollama_url = (None, args.ollama_url) if args.ollama_url else start_stub(args, repo_root)
+    print(
+        f"{len(workload)} requests, concurrency {args.concurrency}, Ollama {ollama_url}"
+        f"{'' if args.ollama_url else ' (stub)'}, {os.cpu_count()} CPUs"
+    )
+    try:
+        # The app opens ./time_rewrite.db, so run it from a scratch directory
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            summary = asyncio.run(run(args, workload, ollama_url, stub))
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+    print_summary(summary)
+    if output:
+        summary["meta"] = {
+            "git": git_revision(repo_root),
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare", "output", "write_workload")},
+        }
+        with open(output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
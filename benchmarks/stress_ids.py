@@ -0,0 +1,166 @@
+"""
+Concurrency stress test for app/ids.py.
+
+Generates IDs from many threads in several processes at once (spawned and
+forked) and checks that:
+
+- no ID repeats, within or across processes
+- each thread sees strictly increasing IDs
+- every process's IDs are strictly increasing in generation order
+- IDs sort in creation-time order (embedded timestamps never go backwards)
+
+Optionally inserts everything into a throwaway SQLite table with the ID as
+primary key, which is where a collision would actually hurt.
+
+    python -m benchmarks.stress_ids --processes 4 --threads 8 --ids 20000
+    python -m benchmarks.stress_ids --db
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.ids import _ALPHABET, _generator, new_id
+
+
+def id_timestamp(id: str) -> datetime:
+    """
+    Creation time encoded in an ID made by new_id (UTC).
+    """
+    ulid = id.rsplit("-", 1)[-1]
+    ms = 0
+    for ch in ulid[:10]:
+        ms = ms * 32 + _ALPHABET.index(ch)
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def generate(threads: int, per_thread: int) -> tuple[list[list[str]], list[str]]:
+    """
+    (ids per thread, ids in process-wide generation order)
+    """
+    per_thread_ids: list[list[str]] = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(i: int) -> None:
+        out = per_thread_ids[i]
+        barrier.wait()
+        for _ in range(per_thread):
+            out.append(new_id("TE"))
+
+    # Record the true generation order by wrapping the generator's lock
+    order: list[str] = []
+    original_new = _generator.new
+
+    def recording_new() -> str:
+        with order_lock:
+            value = original_new()
+            order.append(value)
+            return value
+
+    order_lock = threading.Lock()
+    _generator.new = recording_new
+    try:
+        ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+    finally:
+        _generator.new = original_new
+    return per_thread_ids, order
+
+
+def child(threads: int, per_thread: int, queue) -> None:
+    per_thread_ids, order = generate(threads, per_thread)
+    queue.put((os.getpid(), per_thread_ids, order))
+
+
+def check_process(pid: int, per_thread_ids: list[list[str]], order: list[str]) -> list[str]:
+    problems = []
+    for i, ids in enumerate(per_thread_ids):
+        if any(a >= b for a, b in zip(ids, ids[1:])):
+            problems.append(f"pid {pid} thread {i}: IDs not strictly increasing")
+    if any(a >= b for a, b in zip(order, order[1:])):
+        problems.append(f"pid {pid}: generation order not strictly increasing")
+    stamps = [id_timestamp(x) for x in order[:: max(1, len(order) // 1000)]]
+    if any(a > b for a, b in zip(stamps, stamps[1:])):
+        problems.append(f"pid {pid}: embedded timestamps go backwards")
+    return problems
+
+
+def insert_all(ids: list[str]) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "ids.db"))
+        conn.execute("CREATE TABLE t (id TEXT PRIMARY KEY)")
+        try:
+            conn.executemany("INSERT INTO t (id) VALUES (?)", ((x,) for x in ids))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            return -1
+        finally:
+            count = conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+            conn.close()
+        return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ID generator stress test")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ids", type=int, default=20000, help="IDs per thread")
+    parser.add_argument("--db", action="store_true", help="also insert into a SQLite primary key")
+    args = parser.parse_args()
+
+    # Prime the parent's generator so forked children inherit live state
+    new_id("TE")
+
+    methods = ["spawn"]
+    if "fork" in mp.get_all_start_methods():
+        methods.append("fork")
+
+    started = time.perf_counter()
+    results = []
+    for method in methods:
+        ctx = mp.get_context(method)
+        queue = ctx.Queue()
+        procs = [ctx.Process(target=child, args=(args.threads, args.ids, queue)) for _ in range(args.processes)]
+        for p in procs:
+            p.start()
+        results += [queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+    # And the parent itself, concurrently with nothing, for completeness
+    results.append((os.getpid(), *generate(args.threads, args.ids)))
+    elapsed = time.perf_counter() - started
+
+    problems = []
+    all_ids: list[str] = []
+    for pid, per_thread_ids, order in results:
+        problems += check_process(pid, per_thread_ids, order)
+        all_ids += order
+
+    unique = len(set(all_ids))
+    collisions = len(all_ids) - unique
+    print(
+        f"{len(results)} processes ({', '.join(methods)} + parent) x {args.threads} threads x {args.ids} IDs: "
+        f"{len(all_ids)} IDs in {elapsed:.1f}s, {collisions} collisions"
+    )
+    if args.db:
+        inserted = insert_all(all_ids)
+        print(f"sqlite primary-key insert: {'IntegrityError' if inserted < 0 else f'{inserted} rows'}")
+        if inserted != len(all_ids):
+            problems.append("primary-key insert failed")
+    for p in problems:
+        print("FAIL:", p)
+    if collisions or problems:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
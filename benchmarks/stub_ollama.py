@@ -0,0 +1,175 @@
+"""
+Stub Ollama server for load tests: answers /api/generate and /api/tags
+like Ollama does, with latency driven by token counts instead of a model.
+
+A generation costs `load_ms` once (the first request, like a cold model),
+then prompt tokens / `--prompt-tps` plus completion tokens / `--tps`, with
++/- `--jitter` applied. Tokens are estimated as characters / 4. The answer
+echoes the narrative from the prompt into all three variants, so it passes
+validation and the rewrite comes back as tier "llm".
+
+Fault injection, each decided per request from `--seed`:
+
+- `--malformed-rate`: the answer is not JSON (the app falls back, cause "json")
+- `--timeout-rate`: the request hangs for `--hang-seconds` (client timeout)
+- `--error-rate`: HTTP 500
+
+Streaming requests ("stream": true) get NDJSON chunks paced at `--tps`.
+
+    python -m benchmarks.stub_ollama --port 11500 --tps 40 --malformed-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+
+STATS_KEYS = ("requests", "ok", "malformed", "timeouts", "errors")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def narrative_from_prompt(prompt: str) -> str:
+    return prompt.rsplit("Original narrative: ", 1)[-1].strip()
+
+
+def answer_for(original: str) -> str:
+    text = original[:1].upper() + original[1:]
+    if not text.endswith("."):
+        text += "."
+    return json.dumps({"standard": text, "client_compliant": text, "audit_safe": text, "notes": ""})
+
+
+def create_stub_app(args):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+    rng = random.Random(args.seed)
+    stats = dict.fromkeys(STATS_KEYS, 0)
+    loaded = False
+
+    def jitter(seconds: float) -> float:
+        return seconds * rng.uniform(1 - args.jitter, 1 + args.jitter)
+
+    def timings(prompt_tokens: int, completion_tokens: int) -> tuple[float, float, float]:
+        nonlocal loaded
+        load = 0.0 if loaded else args.load_ms / 1000
+        loaded = True
+        return load, jitter(prompt_tokens / args.prompt_tps), jitter(completion_tokens / args.tps)
+
+    def final_fields(prompt_tokens: int, completion_tokens: int, load: float, prompt_eval: float, eval_: float) -> dict:
+        return {
+            "done": True,
+            "total_duration": int((load + prompt_eval + eval_) * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": completion_tokens,
+            "eval_duration": int(eval_ * 1e9),
+        }
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": args.model}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        prompt = body.get("prompt", "")
+        stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < args.timeout_rate:
+            stats["timeouts"] += 1
+            await asyncio.sleep(args.hang_seconds)
+            return JSONResponse({"error": "stub hang elapsed"}, status_code=504)
+        roll -= args.timeout_rate
+        if roll < args.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": "stub error"}, status_code=500)
+        roll -= args.error_rate
+        if roll < args.malformed_rate:
+            stats["malformed"] += 1
+            text = "Sure! Here is the rewrite: standard -> " + narrative_from_prompt(prompt)
+        else:
+            stats["ok"] += 1
+            text = answer_for(narrative_from_prompt(prompt))
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(text)
+        load, prompt_eval, eval_ = timings(prompt_tokens, completion_tokens)
+
+        if not body.get("stream", True):
+            await asyncio.sleep(load + prompt_eval + eval_)
+            return {
+                "model": body.get("model", args.model),
+                "response": text,
+                **final_fields(prompt_tokens, completion_tokens, load, prompt_eval, eval_),
+            }
+
+        async def chunks():
+            await asyncio.sleep(load + prompt_eval)
+            per_chunk = eval_ / max(1, len(text) // 4)
+            for i in range(0, len(text), 4):
+                await asyncio.sleep(per_chunk)
+                yield json.dumps({"response": text[i : i + 4], "done": False}) + "\n"
+            yield json.dumps({"response": "", **final_fields(prompt_tokens, completion_tokens, load, prompt_eval, eval_)}) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return app
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    The stub's knobs, shared with load tests that spawn it.
+    """
+    group = parser.add_argument_group("stub Ollama")
+    group.add_argument("--tps", type=float, default=40.0, help="generated tokens per second")
+    group.add_argument("--prompt-tps", type=float, default=2000.0, help="prompt tokens evaluated per second")
+    group.add_argument("--load-ms", type=float, default=0.0, help="model load time on the first request")
+    group.add_argument("--jitter", type=float, default=0.2, help="+/- fraction applied to each duration")
+    group.add_argument("--malformed-rate", type=float, default=0.0)
+    group.add_argument("--timeout-rate", type=float, default=0.0)
+    group.add_argument("--error-rate", type=float, default=0.0)
+    group.add_argument("--hang-seconds", type=float, default=30.0, help="how long a timed-out request hangs")
+    group.add_argument("--model", default="qwen2.5:7b")
+
+
+def stub_argv(args) -> list[str]:
+    return [
+        "--tps", str(args.tps),
+        "--prompt-tps", str(args.prompt_tps),
+        "--load-ms", str(args.load_ms),
+        "--jitter", str(args.jitter),
+        "--malformed-rate", str(args.malformed_rate),
+        "--timeout-rate", str(args.timeout_rate),
+        "--error-rate", str(args.error_rate),
+        "--hang-seconds", str(args.hang_seconds),
+        "--model", args.model,
+        "--seed", str(args.seed),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--seed", type=int, default=1)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    print(f"stub ollama on http://{args.host}:{args.port}", flush=True)
+    uvicorn.run(create_stub_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,111 @@
+from contextlib import asynccontextmanager
+
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 
-from app.db import Base, engine
+from app.db import shutdown_db_executor
+from app import llm
+from app.audit import audit_writer
+from app.auth import HasherBusyError, password_hasher
+from app.backends import get_backend_pool
+from app.bootstrap import init_database
+from app.config import settings
+from app.jobs import job_pool
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.scheduler import QueueFullError
 from app.routers import auth as auth_router
 from app.routers import clients as clients_router
 from app.routers import rewrites as rewrites_router
 from app.routers import admin as admin_router
-from app.models import seed_demo_clients_and_admin  # ensures demo data
-
-# Create DB tables
-Base.metadata.create_all(bind=engine)
-seed_demo_clients_and_admin()
-
-app = FastAPI(title="AI Time Entry Rewrite (Scaffolded)")
-
-# CORS for your browser UI
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # tighten later
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Routers
-app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
-app.include_router(clients_router.router, prefix="/clients", tags=["clients"])
-app.include_router(rewrites_router.router, prefix="/rewrites", tags=["rewrites"])
-app.include_router(admin_router.router, prefix="/admin", tags=["admin"])
-
-@app.get("/health")
+from app.routers import jobs as jobs_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema and demo data (once per process, serialised across workers)
+    init_database()
+    # One pooled, keep-alive HTTP client to Ollama for the whole process
+    http_client = await llm.start_http_client()
+    # Background /api/tags probes keep dead Ollama backends out of rotation
+    get_backend_pool().start(http_client)
+    # Audit events are written behind the request, in batches
+    if settings.audit_write_behind:
+        audit_writer.start()
+    # Background import workers; resumes items interrupted by a restart
+    await job_pool.start(settings.job_workers)
+    try:
+        yield
+    finally:
+        await job_pool.stop()
+        await get_backend_pool().stop()
+        await llm.close_http_client()
+        # Durable flush of queued audit events before the process goes away
+        audit_writer.stop()
+        password_hasher.shutdown()
+        shutdown_db_executor()
+
+
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def hasher_busy_handler(request: Request, exc: HasherBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 def health():
     return {"status": "ok"}
+
+
+def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+def create_app() -> FastAPI:
+    """
+    Build the ASGI app. Cheap: no database or network work happens until
+    the lifespan starts (`uvicorn main:app`, or `--factory main:create_app`).
+    """
+    app = FastAPI(title="AI Time Entry Rewrite (Scaffolded)", lifespan=lifespan)
+
+    # CORS for your browser UI
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # tighten later
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        # Keyset pagination cursors (GET /admin/audit-events)
+        expose_headers=["X-Next-Cursor"],
+    )
+
+    # Per-route latency and DB query histograms for GET /metrics
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+
+    app.add_exception_handler(QueueFullError, queue_full_handler)
+    app.add_exception_handler(HasherBusyError, hasher_busy_handler)
+
+    # Routers
+    app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
+    app.include_router(clients_router.router, prefix="/clients", tags=["clients"])
+    app.include_router(rewrites_router.router, prefix="/rewrites", tags=["rewrites"])
+    app.include_router(admin_router.router, prefix="/admin", tags=["admin"])
+    app.include_router(jobs_router.router, prefix="/jobs", tags=["jobs"])
+
+    app.add_api_route("/health", health, methods=["GET"])
+    if settings.metrics_enabled:
+        app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    return app
+
+
+app = create_app()